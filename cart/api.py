@@ -0,0 +1,183 @@
+import json
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+from products.models import Product
+from .counts import reset_cart_count
+from .models import Cart, CartItem, WishList
+from .session_cart import SessionCart
+from . import pricing
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+WISHLIST_OPERATIONS = ('add', 'remove')
+
+# Upper bound on operations per request, to keep one batch one short transaction
+MAX_OPERATIONS = 200
+
+
+class InvalidBatch(Exception):
+    pass
+
+
+def _read_operations(payload, key, allowed):
+    operations = payload.get(key, [])
+    if not isinstance(operations, list):
+        raise InvalidBatch(f'"{key}" must be a list of operations.')
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in allowed:
+            raise InvalidBatch(f'{key}[{index}]: "op" must be one of: {", ".join(allowed)}.')
+        product_id = operation.get('product')
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            raise InvalidBatch(f'{key}[{index}]: "product" must be a product id.')
+        quantity = operation.get('quantity', 1 if operation['op'] == 'add' else 0)
+        if operation['op'] != 'remove' and (not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0):
+            raise InvalidBatch(f'{key}[{index}]: "quantity" must be a whole number of at least 0.')
+        parsed.append((operation['op'], product_id, quantity))
+    return parsed
+
+
+def _parse(request):
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        raise InvalidBatch('The request body is not valid JSON.')
+    if not isinstance(payload, dict):
+        raise InvalidBatch('Expected a JSON object.')
+    cart_operations = _read_operations(payload, 'cart', CART_OPERATIONS)
+    wishlist_operations = _read_operations(payload, 'wishlist', WISHLIST_OPERATIONS)
+    if len(cart_operations) + len(wishlist_operations) > MAX_OPERATIONS:
+        raise InvalidBatch(f'At most {MAX_OPERATIONS} operations are accepted per request.')
+    if wishlist_operations and not request.user.is_authenticated:
+        raise InvalidBatch('Log in to change your wishlist.')
+    return cart_operations, wishlist_operations
+
+
+def _net_changes(operations):
+    """
+    Collapse the operations into one change per product, applied in order:
+    {product_id: (is_absolute, quantity)}. An add on its own stays relative,
+    so it is applied on top of whatever the cart holds at write time.
+    """
+    changes = {}
+    for op, product_id, quantity in operations:
+        if op == 'add':
+            is_absolute, current = changes.get(product_id, (False, 0))
+            changes[product_id] = (is_absolute, current + quantity)
+        elif op == 'set':
+            changes[product_id] = (True, quantity)
+        else:
+            changes[product_id] = (True, 0)
+    return changes
+
+
+def _check_products(changes, wishlist_operations):
+    """Products being added must exist and be on sale; removals of vanished products are harmless"""
+    wanted = {product_id for product_id, (is_absolute, quantity) in changes.items() if quantity > 0}
+    wanted |= {product_id for op, product_id, quantity in wishlist_operations if op == 'add'}
+    available = set(Product.objects.filter(pk__in=wanted, is_available=True).values_list('pk', flat=True))
+    missing = wanted - available
+    if missing:
+        raise InvalidBatch(f'Unknown or unavailable products: {", ".join(map(str, sorted(missing)))}.')
+
+
+def _apply_to_cart(cart, changes):
+    """At most three statements whatever the batch size: increments, absolute quantities, removals"""
+    increments = {pk: quantity for pk, (is_absolute, quantity) in changes.items() if not is_absolute and quantity}
+    quantities = {pk: quantity for pk, (is_absolute, quantity) in changes.items() if is_absolute and quantity}
+    removals = [pk for pk, (is_absolute, quantity) in changes.items() if is_absolute and not quantity]
+    if increments:
+        CartItem.add_many(cart.pk, increments)
+    if quantities:
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product_id=pk, quantity=quantity) for pk, quantity in quantities.items()],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity'],
+        )
+    if removals:
+        CartItem.objects.filter(cart=cart, product_id__in=removals).delete()
+
+
+def _apply_to_session_cart(session_cart, changes):
+    for product_id, (is_absolute, quantity) in changes.items():
+        if is_absolute:
+            session_cart.set(product_id, quantity)
+        elif quantity:
+            session_cart.add(product_id, quantity)
+
+
+def _apply_to_wishlist(wishlist, operations):
+    # The last operation on a product wins
+    wanted = {}
+    for op, product_id, quantity in operations:
+        wanted[product_id] = op == 'add'
+    added = [pk for pk, keep in wanted.items() if keep]
+    removed = [pk for pk, keep in wanted.items() if not keep]
+    if added:
+        wishlist.products.add(*added)
+    if removed:
+        wishlist.products.remove(*removed)
+
+
+def _cart_state(cart_items):
+    totals = pricing.CartTotals.from_items(cart_items)
+    return {
+        'items': [
+            {
+                'id': item.pk,
+                'product': item.product_id,
+                'name': item.product.name,
+                'quantity': item.quantity,
+                'unit_price': str(item.product.effective_price),
+                'line_total': str(totals.line_totals[item.pk]),
+            }
+            for item in cart_items
+        ],
+        'item_count': totals.item_count,
+        'subtotal': str(totals.subtotal),
+        'discount': str(totals.discount),
+        'shipping': str(totals.shipping),
+        'tax': str(totals.tax),
+        'total': str(totals.total),
+    }
+
+
+@require_http_methods(['GET', 'POST'])
+def batch(request):
+    """
+    Read the cart (GET), or apply a batch of cart and wishlist operations in
+    one transaction and return the updated state (POST). The body looks like
+    {"cart": [{"op": "add"|"set"|"remove", "product": id, "quantity": n}, ...],
+     "wishlist": [{"op": "add"|"remove", "product": id}, ...]}.
+    Anonymous visitors can change their cart but not a wishlist.
+    """
+    if request.method == 'POST':
+        try:
+            cart_operations, wishlist_operations = _parse(request)
+            changes = _net_changes(cart_operations)
+            _check_products(changes, wishlist_operations)
+        except InvalidBatch as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    else:
+        changes, wishlist_operations = {}, []
+
+    data = {}
+    if request.user.is_authenticated:
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(user=request.user)
+            if changes:
+                _apply_to_cart(cart, changes)
+                pricing.invalidate(cart.pk)
+            wishlist, created = WishList.objects.get_or_create(user=request.user)
+            if wishlist_operations:
+                _apply_to_wishlist(wishlist, wishlist_operations)
+        if changes:
+            reset_cart_count(request)
+        data['cart'] = _cart_state(list(cart.items.select_related('product')))
+        data['wishlist'] = list(wishlist.products.values_list('pk', flat=True))
+    else:
+        session_cart = SessionCart(request)
+        _apply_to_session_cart(session_cart, changes)
+        data['cart'] = _cart_state(session_cart.items())
+    return JsonResponse(data)
@@ -0,0 +1,8 @@
+from .counts import get_cart_count
+
+
+def cart(request):
+    """Cart badge count for the site header"""
+    return {
+        'cart_count': get_cart_count(request),
+    }
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db.models import Sum
+from .models import CartItem
+from .session_cart import SessionCart
+
+# Long enough to keep the header query-free; any cart change corrects the counter
+COUNT_TIMEOUT = 60 * 60 * 24
+
+
+def _user_key(user_id):
+    return f'cart:count:user:{user_id}'
+
+
+def _key(request):
+    # Anonymous carts live in the session and are counted from it directly
+    if request.user.is_authenticated:
+        return _user_key(request.user.pk)
+    return None
+
+
+def _count_from_db(request):
+    return CartItem.objects.filter(cart__user=request.user).aggregate(total=Sum('quantity'))['total'] or 0
+
+
+def get_cart_count(request):
+    """Number of units in the visitor's cart, from the cache when warm"""
+    key = _key(request)
+    if key is None:
+        return SessionCart(request).count
+    count = cache.get(key)
+    if count is None:
+        count = _count_from_db(request)
+        cache.set(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def add_to_cart_count(request, quantity):
+    """Adjust a warm counter in place; a cold one is simply recounted on next read"""
+    key = _key(request)
+    if key is not None:
+        try:
+            cache.incr(key, quantity)
+        except ValueError:
+            pass
+
+
+def reset_cart_count(request):
+    key = _key(request)
+    if key is not None:
+        cache.delete(key)
+
+
+def reset_user_cart_count(user):
+    """For changes made outside the user's own requests, e.g. while logging in"""
+    cache.delete(_user_key(user.pk))
+
+
+def reset_user_cart_counts(user_ids):
+    """For bulk changes that take lines out of many users' carts at once"""
+    cache.delete_many([_user_key(user_id) for user_id in user_ids])
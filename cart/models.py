@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import connections, models, router
 from users.models import CustomUser
 from products.models import Product
+from . import pricing
 
 class Cart(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='cart')
@@ -12,7 +13,7 @@ class Cart(models.Model):
     
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return pricing.get_cart_totals(self).merchandise
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -25,9 +26,45 @@ class CartItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
     
+    # Rows per upsert statement; three parameters each stays under SQLite's variable limit
+    UPSERT_BATCH_SIZE = 300
+    
+    @classmethod
+    def add(cls, cart_id, product_id, quantity):
+        """Add quantity of a product to a cart in one statement; returns the line's new quantity"""
+        return cls.add_many(cart_id, {product_id: quantity})[product_id]
+    
+    @classmethod
+    def add_many(cls, cart_id, quantities):
+        """
+        Add {product_id: quantity} to a cart with INSERT ... ON CONFLICT DO
+        UPDATE, so a line that already exists is incremented in the same
+        statement instead of being read first. Concurrent adds of the same
+        product accumulate rather than colliding on the (cart, product)
+        constraint. Returns {product_id: new quantity}.
+        """
+        connection = connections[router.db_for_write(cls)]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        quantities = list(quantities.items())
+        result = {}
+        with connection.cursor() as cursor:
+            for start in range(0, len(quantities), cls.UPSERT_BATCH_SIZE):
+                batch = quantities[start:start + cls.UPSERT_BATCH_SIZE]
+                cursor.execute(
+                    f'INSERT INTO {table} ({qn("cart_id")}, {qn("product_id")}, {qn("quantity")}) '
+                    f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({qn("cart_id")}, {qn("product_id")}) '
+                    f'DO UPDATE SET {qn("quantity")} = {table}.{qn("quantity")} + EXCLUDED.{qn("quantity")} '
+                    f'RETURNING {qn("product_id")}, {qn("quantity")}',
+                    [value for product_id, quantity in batch for value in (cart_id, product_id, quantity)],
+                )
+                result.update(cursor.fetchall())
+        return result
+    
     @property
     def total_price(self):
-        return self.product.price * self.quantity
+        return self.product.effective_price * self.quantity
 
 class WishList(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='wishlist')
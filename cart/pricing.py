@@ -0,0 +1,89 @@
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from django.core.cache import cache
+from django.db import transaction
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+SHIPPING_AMOUNT = Decimal('10.00')
+TAX_RATE = Decimal('0.10')
+
+# Totals are dropped on every cart or price change; the timeout only bounds memory
+TOTALS_TIMEOUT = 60 * 60 * 24
+
+PRICES_VERSION_KEY = 'cart:prices_version'
+
+
+def _version_key(cart_id):
+    return f'cart:totals_version:{cart_id}'
+
+
+def _totals_key(cart_id, version, prices_version):
+    return f'cart:totals:{cart_id}:{version}:{prices_version}'
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+class CartTotals:
+    """
+    Everything a cart page, the checkout and an order need to know about the
+    money in a cart, computed in Decimal in a single pass over its lines.
+
+    subtotal is at list prices, discount is what discount prices take off it,
+    and tax is charged on what is left (shipping is not taxed).
+    """
+
+    def __init__(self, lines):
+        self.item_count = 0
+        self.subtotal = ZERO
+        self.discount = ZERO
+        # Line total per cart item id, at the price actually charged
+        self.line_totals = {}
+        for item_id, quantity, price, effective_price in lines:
+            self.item_count += quantity
+            self.subtotal += price * quantity
+            self.discount += (price - effective_price) * quantity
+            self.line_totals[item_id] = effective_price * quantity
+        self.merchandise = self.subtotal - self.discount
+        self.shipping = SHIPPING_AMOUNT if self.item_count else ZERO
+        self.tax = (self.merchandise * TAX_RATE).quantize(CENT, rounding=ROUND_HALF_UP)
+        self.total = self.merchandise + self.shipping + self.tax
+
+    @classmethod
+    def from_items(cls, cart_items):
+        """Totals for cart items already loaded with their products"""
+        return cls(
+            (item.pk, item.quantity, item.product.price, item.product.effective_price)
+            for item in cart_items
+        )
+
+    @classmethod
+    def from_cart(cls, cart):
+        """Totals for a cart straight from the database, in one query"""
+        return cls(cart.items.values_list('pk', 'quantity', 'product__price', 'product__effective_price'))
+
+
+def get_cart_totals(cart):
+    """CartTotals for the cart, from the cache while neither the cart nor any price has changed"""
+    key = _totals_key(cart.pk, _version(_version_key(cart.pk)), _version(PRICES_VERSION_KEY))
+    totals = cache.get(key)
+    if totals is None:
+        totals = CartTotals.from_cart(cart)
+        cache.set(key, totals, TOTALS_TIMEOUT)
+    return totals
+
+
+def invalidate(cart_id):
+    """Call after changing a cart's items; takes effect once the transaction commits"""
+    transaction.on_commit(lambda: cache.set(_version_key(cart_id), time.time_ns(), None))
+
+
+def invalidate_prices():
+    """Call after any product price change; every cached cart total goes stale"""
+    transaction.on_commit(lambda: cache.set(PRICES_VERSION_KEY, time.time_ns(), None))
@@ -0,0 +1,85 @@
+from products.models import Product
+
+SESSION_KEY = 'cart'
+
+
+class SessionCartItem:
+    """
+    A line of an anonymous cart, shaped like a CartItem for templates and
+    pricing. Its id is the product id, which is what the remove and update
+    views expect for anonymous visitors.
+    """
+
+    def __init__(self, product, quantity):
+        self.id = self.pk = product.pk
+        self.product = product
+        self.product_id = product.pk
+        self.quantity = quantity
+
+    @property
+    def total_price(self):
+        return self.product.effective_price * self.quantity
+
+
+class SessionCart:
+    """
+    An anonymous visitor's cart, kept in the session as {product id: quantity}
+    so browsing without an account never writes cart rows. Merged into the
+    user's Cart on login (see cart.signals).
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+
+    @property
+    def quantities(self):
+        """{product_id: quantity}; session JSON only has string keys"""
+        return {int(product_id): quantity for product_id, quantity in self.session.get(SESSION_KEY, {}).items()}
+
+    def _save(self, quantities):
+        if quantities:
+            self.session[SESSION_KEY] = {str(product_id): quantity for product_id, quantity in quantities.items()}
+        else:
+            self.session.pop(SESSION_KEY, None)
+
+    def get(self, product_id):
+        return self.quantities.get(product_id, 0)
+
+    def add(self, product_id, quantity):
+        """Returns the line's new quantity"""
+        quantities = self.quantities
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        self._save(quantities)
+        return quantities[product_id]
+
+    def set(self, product_id, quantity):
+        quantities = self.quantities
+        if quantity > 0:
+            quantities[product_id] = quantity
+        else:
+            quantities.pop(product_id, None)
+        self._save(quantities)
+
+    def remove(self, product_id):
+        self.set(product_id, 0)
+
+    def clear(self):
+        self._save({})
+
+    @property
+    def count(self):
+        return sum(self.quantities.values())
+
+    def items(self):
+        """The cart's lines with their products, fetched in one query; lines whose product is gone are dropped"""
+        quantities = self.quantities
+        if not quantities:
+            return []
+        products = Product.objects.filter(is_available=True).in_bulk(quantities)
+        if len(products) != len(quantities):
+            self._save({product_id: quantity for product_id, quantity in quantities.items() if product_id in products})
+        return [
+            SessionCartItem(products[product_id], quantity)
+            for product_id, quantity in quantities.items()
+            if product_id in products
+        ]
@@ -0,0 +1,65 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from products.models import Product
+from .counts import reset_user_cart_count
+from .models import Cart, CartItem, WishList
+from .session_cart import SessionCart
+from . import pricing, wishlists
+
+
+@receiver(post_save, sender=Product)
+def invalidate_totals_for_price(sender, instance, created=False, raw=False, **kwargs):
+    """A new product is in nobody's cart yet; an edited one matters only if its price moved"""
+    if raw or created:
+        return
+    if getattr(instance, '_loaded_effective_price', None) != instance.effective_price:
+        pricing.invalidate_prices()
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_totals_for_product(sender, instance, **kwargs):
+    # Deleting a product cascades to the cart items holding it
+    pricing.invalidate_prices()
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """Fold the cart collected before logging in into the user's cart with one bulk upsert"""
+    if request is None or not hasattr(request, 'session'):
+        return
+    session_cart = SessionCart(request)
+    quantities = session_cart.quantities
+    if not quantities:
+        return
+    # Skip products removed from sale since they were added
+    available = Product.objects.filter(pk__in=quantities, is_available=True).values_list('pk', flat=True)
+    quantities = {product_id: quantities[product_id] for product_id in available}
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        if quantities:
+            CartItem.add_many(cart.pk, quantities)
+            pricing.invalidate(cart.pk)
+    session_cart.clear()
+    reset_user_cart_count(user)
+
+
+def invalidate_wishlist_ids_on_commit(user_ids):
+    def invalidate():
+        for user_id in user_ids:
+            wishlists.invalidate(user_id)
+    transaction.on_commit(invalidate)
+
+
+@receiver(m2m_changed, sender=WishList.products.through)
+def invalidate_wishlist_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the cached id set of every user whose wishlist gained or lost products"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_wishlist_ids_on_commit([instance.user_id])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_wishlist_ids_on_commit(list(WishList.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)))
+    elif action == 'pre_clear':
+        # product.wishlists.clear() only says which wishlists it touches before it runs
+        invalidate_wishlist_ids_on_commit(list(instance.wishlists.values_list('user_id', flat=True)))
@@ -0,0 +1,10 @@
+from django import template
+from ..wishlists import is_wishlisted
+
+register = template.Library()
+
+
+@register.filter
+def in_wishlist(product, user):
+    """{% if product|in_wishlist:request.user %}; accepts a product or a product id"""
+    return is_wishlisted(user, getattr(product, 'pk', product))
@@ -1,3 +1,347 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import time
+from decimal import Decimal
+from unittest import skipUnless
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from products.context_processors import categories
+from products.models import Category, Product
+from products.tests import create_product
+from users.models import Address, CustomUser
+from .models import Cart, CartItem, WishList
+from . import context_processors, counts, pricing, wishlists
 
-# Create your tests here.
+logger = logging.getLogger(__name__)
+
+
+class CartPricingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        self.category = Category.objects.create(name='Books', slug='books')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_totals_apply_discounts_in_decimal(self):
+        plain = create_product(self.user, self.category, 'plain', Decimal('19.99'))
+        discounted = create_product(self.user, self.category, 'discounted', Decimal('10.00'), Decimal('7.35'))
+        CartItem.objects.create(cart=self.cart, product=plain, quantity=3)
+        CartItem.objects.create(cart=self.cart, product=discounted, quantity=2)
+
+        totals = pricing.get_cart_totals(self.cart)
+        self.assertEqual(totals.item_count, 5)
+        self.assertEqual(totals.subtotal, Decimal('79.97'))
+        self.assertEqual(totals.discount, Decimal('5.30'))
+        self.assertEqual(totals.merchandise, Decimal('74.67'))
+        self.assertEqual(totals.shipping, Decimal('10.00'))
+        self.assertEqual(totals.tax, Decimal('7.47'))
+        self.assertEqual(totals.total, Decimal('92.14'))
+
+    def test_empty_cart_has_no_shipping(self):
+        self.assertEqual(pricing.get_cart_totals(self.cart).total, Decimal('0.00'))
+
+    def test_totals_are_cached_until_the_cart_or_a_price_changes(self):
+        product = create_product(self.user, self.category, 'book', Decimal('10.00'))
+        item = CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        self.assertEqual(pricing.get_cart_totals(self.cart).merchandise, Decimal('10.00'))
+
+        with self.assertNumQueries(0):
+            pricing.get_cart_totals(self.cart)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.quantity = 2
+            item.save()
+            pricing.invalidate(self.cart.pk)
+        self.assertEqual(pricing.get_cart_totals(self.cart).merchandise, Decimal('20.00'))
+
+        product = Product.objects.get(pk=product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.discount_price = Decimal('8.00')
+            product.save()
+        self.assertEqual(pricing.get_cart_totals(self.cart).merchandise, Decimal('16.00'))
+
+
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class CartPricingBenchmark(TestCase):
+    LINES = 100
+    ROUNDS = 20
+
+    def test_hundred_line_cart(self):
+        user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        cart = Cart.objects.create(user=user)
+        products = [
+            create_product(user, category, f'book-{i}', Decimal('9.99'), Decimal('8.49') if i % 2 else None)
+            for i in range(self.LINES)
+        ]
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in products])
+
+        # What every render used to do: one product query per line
+        started = time.perf_counter()
+        for _ in range(self.ROUNDS):
+            per_line = sum(item.total_price for item in cart.items.all())
+        per_line_elapsed = (time.perf_counter() - started) / self.ROUNDS
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            totals = pricing.get_cart_totals(cart)
+        self.assertEqual(totals.merchandise, per_line)
+
+        started = time.perf_counter()
+        for _ in range(self.ROUNDS):
+            cache.clear()
+            pricing.get_cart_totals(cart)
+        single_pass_elapsed = (time.perf_counter() - started) / self.ROUNDS
+
+        started = time.perf_counter()
+        for _ in range(self.ROUNDS):
+            pricing.get_cart_totals(cart)
+        cached_elapsed = (time.perf_counter() - started) / self.ROUNDS
+
+        logger.info(
+            '%d-line cart: %.2f ms with a query per line, %.2f ms single pass, %.3f ms cached',
+            self.LINES, per_line_elapsed * 1000, single_pass_elapsed * 1000, cached_elapsed * 1000,
+        )
+        self.assertLess(single_pass_elapsed, per_line_elapsed)
+        self.assertLess(cached_elapsed, single_pass_elapsed)
+
+
+class CartUpsertTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.first = create_product(self.user, category, 'first', Decimal('5.00'))
+        self.second = create_product(self.user, category, 'second', Decimal('5.00'))
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_add_inserts_then_increments_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(CartItem.add(self.cart.pk, self.first.pk, 2), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(CartItem.add(self.cart.pk, self.first.pk, 3), 5)
+        self.assertEqual(self.cart.items.get().quantity, 5)
+
+    def test_add_many(self):
+        CartItem.add(self.cart.pk, self.first.pk, 1)
+        quantities = CartItem.add_many(self.cart.pk, {self.first.pk: 2, self.second.pk: 4})
+        self.assertEqual(quantities, {self.first.pk: 3, self.second.pk: 4})
+
+    def test_add_to_cart_view_accumulates(self):
+        self.client.force_login(self.user)
+        url = reverse('cart:add_to_cart', args=[self.first.pk])
+        self.client.post(url, {'quantity': 2})
+        self.client.post(url, {'quantity': 1})
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=self.first).quantity, 3)
+
+
+class SessionCartTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.first = create_product(self.user, category, 'first', Decimal('5.00'))
+        self.second = create_product(self.user, category, 'second', Decimal('7.50'))
+
+    def test_anonymous_adds_never_write_cart_rows(self):
+        self.client.post(reverse('cart:add_to_cart', args=[self.first.pk]), {'quantity': 2})
+        self.client.post(reverse('cart:add_to_cart', args=[self.second.pk]))
+        self.client.post(reverse('cart:add_to_cart', args=[self.first.pk]))
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.session['cart'], {str(self.first.pk): 3, str(self.second.pk): 1})
+
+        self.client.post(reverse('cart:update_cart', args=[self.second.pk]), {'quantity': 0})
+        self.assertEqual(self.client.session['cart'], {str(self.first.pk): 3})
+
+    def test_login_merges_session_cart_with_one_upsert(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.first, quantity=1)
+        self.client.post(reverse('cart:add_to_cart', args=[self.first.pk]), {'quantity': 2})
+        self.client.post(reverse('cart:add_to_cart', args=[self.second.pk]), {'quantity': 4})
+
+        self.client.login(username='buyer', password='secret')
+        self.assertEqual(dict(cart.items.values_list('product_id', 'quantity')), {
+            self.first.pk: 3, self.second.pk: 4,
+        })
+        self.assertNotIn('cart', self.client.session)
+
+
+class BatchApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [create_product(self.user, category, f'book-{i}', Decimal('10.00')) for i in range(4)]
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.products[1], quantity=1)
+
+    def post(self, payload):
+        return self.client.post(reverse('cart:api'), json.dumps(payload), content_type='application/json')
+
+    def test_batch_applies_cart_and_wishlist_operations(self):
+        self.client.force_login(self.user)
+        first, second, third, fourth = (product.pk for product in self.products)
+        response = self.post({
+            'cart': [
+                {'op': 'add', 'product': first, 'quantity': 2},
+                {'op': 'remove', 'product': second},
+                {'op': 'set', 'product': third, 'quantity': 4},
+                {'op': 'add', 'product': third},
+            ],
+            'wishlist': [{'op': 'add', 'product': fourth}],
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual({item['product']: item['quantity'] for item in data['cart']['items']}, {first: 3, third: 5})
+        self.assertEqual(data['cart']['total'], '98.00')
+        self.assertEqual(data['wishlist'], [fourth])
+
+    def test_invalid_batch_changes_nothing(self):
+        self.client.force_login(self.user)
+        response = self.post({'cart': [
+            {'op': 'add', 'product': self.products[2].pk},
+            {'op': 'add', 'product': 999999},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_anonymous_batch_uses_session_cart(self):
+        response = self.post({'cart': [{'op': 'set', 'product': self.products[3].pk, 'quantity': 2}]})
+        self.assertEqual(response.json()['cart']['item_count'], 2)
+        self.assertEqual(self.post({'wishlist': [{'op': 'add', 'product': self.products[3].pk}]}).status_code, 400)
+
+
+class CartCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.first = create_product(self.user, category, 'first', Decimal('5.00'))
+        self.second = create_product(self.user, category, 'second', Decimal('5.00'))
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or self.user
+        request.session = self.client.session
+        return request
+
+    def warm_count(self):
+        """The header's count, which must come straight from the warm counter"""
+        with self.assertNumQueries(0):
+            return counts.get_cart_count(self.request())
+
+    def test_context_processors_are_query_free_when_warm(self):
+        for user in (self.user, AnonymousUser()):
+            with self.subTest(user=user):
+                request = self.request(user)
+                context_processors.cart(request)
+                categories(request)
+                with self.assertNumQueries(0):
+                    self.assertEqual(context_processors.cart(request), {'cart_count': 0})
+                    self.assertEqual(len(categories(request)['categories']), 1)
+
+    def test_counter_follows_cart_changes(self):
+        self.client.force_login(self.user)
+        self.assertEqual(counts.get_cart_count(self.request()), 0)
+        self.client.post(reverse('cart:add_to_cart', args=[self.first.pk]), {'quantity': 2})
+        self.client.post(reverse('cart:add_to_cart', args=[self.first.pk]))
+        self.client.post(reverse('cart:add_to_cart', args=[self.second.pk]), {'quantity': 4})
+        self.assertEqual(self.warm_count(), 7)
+
+        first, second = CartItem.objects.order_by('pk')
+        self.client.post(reverse('cart:update_cart', args=[first.pk]), {'quantity': 1})
+        self.assertEqual(self.warm_count(), 5)
+        self.client.post(reverse('cart:update_cart', args=[second.pk]), {'quantity': 0})
+        self.assertEqual(self.warm_count(), 1)
+        self.client.post(reverse('cart:remove_from_cart', args=[first.pk]))
+        self.assertEqual(self.warm_count(), 0)
+
+    def test_checkout_resets_the_counter(self):
+        address = Address.objects.create(
+            user=self.user, address_line1='1 Main St', city='Town', state='ST',
+            zip_code='00000', country='Country', is_default=True,
+        )
+        self.client.force_login(self.user)
+        self.assertEqual(counts.get_cart_count(self.request()), 0)
+        self.client.post(reverse('cart:add_to_cart', args=[self.first.pk]), {'quantity': 2})
+        self.assertEqual(self.warm_count(), 2)
+        response = self.client.post(reverse('orders:checkout'), {
+            'shipping_address': address.pk, 'billing_address': address.pk, 'payment_method': 'credit_card',
+        })
+        self.assertRedirects(response, reverse('orders:payment'), fetch_redirect_response=False)
+        self.assertEqual(counts.get_cart_count(self.request()), 0)
+
+    def test_login_merge_resets_the_counter(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.first, quantity=1)
+        self.assertEqual(counts.get_cart_count(self.request()), 1)
+
+        self.client.post(reverse('cart:add_to_cart', args=[self.second.pk]), {'quantity': 3})
+        self.assertEqual(counts.get_cart_count(self.request(AnonymousUser())), 3)
+        self.client.login(username='buyer', password='secret')
+        self.assertEqual(counts.get_cart_count(self.request()), 4)
+
+
+class WishlistIdsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [create_product(self.user, category, f'book-{i}', Decimal('10.00')) for i in range(3)]
+        self.wishlist = WishList.objects.create(user=self.user)
+
+    def fresh_user(self):
+        return CustomUser.objects.get(pk=self.user.pk)
+
+    def test_ids_are_cached_and_follow_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wishlist.products.add(self.products[0])
+        self.assertEqual(wishlists.get_wishlist_ids(self.fresh_user()), {self.products[0].pk})
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(wishlists.is_wishlisted(user, self.products[0].pk))
+            self.assertFalse(wishlists.is_wishlisted(user, self.products[1].pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].wishlists.add(self.wishlist)
+            self.wishlist.products.remove(self.products[0])
+        self.assertEqual(wishlists.get_wishlist_ids(self.fresh_user()), {self.products[1].pk})
+
+    def test_read_racing_a_change_cannot_outlive_it(self):
+        # A read that started before the change stores its stale set after the invalidation
+        stale_key = wishlists._key(self.user.pk, wishlists._version(self.user.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wishlist.products.add(self.products[0])
+        cache.set(stale_key, frozenset(), wishlists.IDS_TIMEOUT)
+        self.assertEqual(wishlists.get_wishlist_ids(self.fresh_user()), {self.products[0].pk})
+
+    def test_views_write_whatever_the_cached_ids_say(self):
+        self.client.force_login(self.user)
+        wishlists.get_wishlist_ids(self.fresh_user())
+        # Changed behind the cache's back, as a lost invalidation would leave it
+        WishList.products.through.objects.create(wishlist=self.wishlist, product=self.products[0])
+        self.client.get(reverse('cart:remove_from_wishlist', args=[self.products[0].pk]))
+        self.assertFalse(self.wishlist.products.exists())
+
+        cache.set(wishlists._key(self.user.pk, wishlists._version(self.user.pk)), frozenset([self.products[1].pk]))
+        self.client.get(reverse('cart:add_to_wishlist', args=[self.products[1].pk]))
+        self.assertEqual(list(self.wishlist.products.all()), [self.products[1]])
+
+    def test_template_filter_needs_no_queries_per_card(self):
+        self.wishlist.products.add(self.products[2])
+        user = self.fresh_user()
+        wishlists.get_wishlist_ids(user)
+        template = Template(
+            '{% load wishlist_tags %}{% for product in products %}'
+            '{% if product|in_wishlist:user %}♥{% else %}♡{% endif %}{% endfor %}'
+        )
+        with self.assertNumQueries(0):
+            rendered = template.render(Context({'products': self.products, 'user': user}))
+        self.assertEqual(rendered, '♡♡♥')
@@ -2,87 +2,116 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .models import Cart, CartItem, WishList
+from .counts import add_to_cart_count
+from .session_cart import SessionCart
+from .wishlists import is_wishlisted
+from . import pricing
 from products.models import Product
 
 def _get_or_create_cart(request):
-    """Helper function to get or create a cart for a user or session"""
+    """Helper function to get or create a cart for a user, or the session cart of an anonymous visitor"""
     if request.user.is_authenticated:
         cart, created = Cart.objects.get_or_create(user=request.user)
     else:
-        cart_id = request.session.get('cart_id')
-        if cart_id:
-            try:
-                cart = Cart.objects.get(id=cart_id)
-            except Cart.DoesNotExist:
-                cart = Cart.objects.create(user=None)
-                request.session['cart_id'] = cart.id
-        else:
-            cart = Cart.objects.create(user=None)
-            request.session['cart_id'] = cart.id
+        cart = SessionCart(request)
     return cart
 
 def cart_detail(request):
     """View to display the cart contents"""
     cart = _get_or_create_cart(request)
     
+    if request.user.is_authenticated:
+        cart_items = cart.items.select_related('product')
+        totals = pricing.get_cart_totals(cart)
+    else:
+        cart_items = cart.items()
+        totals = pricing.CartTotals.from_items(cart_items)
+    
     context = {
         'cart': cart,
-        'cart_items': cart.items.all(),
+        'cart_items': cart_items,
+        'totals': totals,
     }
     return render(request, 'cart/cart_detail.html', context)
 
 def add_to_cart(request, product_id):
     """Add a product to the cart"""
     product = get_object_or_404(Product, id=product_id, is_available=True)
-    cart = _get_or_create_cart(request.user)
+    cart = _get_or_create_cart(request)
     
     quantity = int(request.POST.get('quantity', 1))
+    if quantity < 1:
+        messages.error(request, 'Please choose a quantity of at least 1.')
+        return redirect('cart:cart_detail')
     
-    # Check if product is already in cart
-    try:
-        cart_item = CartItem.objects.get(cart=cart, product=product)
-        cart_item.quantity += quantity
-        cart_item.save()
-        messages.success(request, f'Updated {product.name} quantity in your cart.')
-    except CartItem.DoesNotExist:
-        CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+    if request.user.is_authenticated:
+        # Inserts the line or increments an existing one in a single statement
+        new_quantity = CartItem.add(cart.pk, product.pk, quantity)
+        pricing.invalidate(cart.pk)
+    else:
+        new_quantity = cart.add(product.pk, quantity)
+    if new_quantity == quantity:
         messages.success(request, f'Added {product.name} to your cart.')
+    else:
+        messages.success(request, f'Updated {product.name} quantity in your cart.')
+    add_to_cart_count(request, quantity)
     
     return redirect('cart:cart_detail')
 
 def remove_from_cart(request, item_id):
-    """Remove an item from the cart"""
+    """Remove an item from the cart; for anonymous visitors item_id is the product id"""
+    if not request.user.is_authenticated:
+        product = get_object_or_404(Product, id=item_id)
+        SessionCart(request).remove(product.pk)
+        messages.success(request, f'Removed {product.name} from your cart.')
+        return redirect('cart:cart_detail')
+    
     cart_item = get_object_or_404(CartItem, id=item_id)
     
     # Check if user owns this cart item
-    if request.user.is_authenticated and cart_item.cart.user != request.user:
+    if cart_item.cart.user != request.user:
         messages.error(request, 'You do not have permission to modify this cart.')
         return redirect('cart:cart_detail')
     
     product_name = cart_item.product.name
     cart_item.delete()
+    add_to_cart_count(request, -cart_item.quantity)
+    pricing.invalidate(cart_item.cart_id)
     messages.success(request, f'Removed {product_name} from your cart.')
     
     return redirect('cart:cart_detail')
 
 def update_cart(request, item_id):
-    """Update cart item quantity"""
-    cart_item = get_object_or_404(CartItem, id=item_id)
+    """Update cart item quantity; for anonymous visitors item_id is the product id"""
+    quantity = int(request.POST.get('quantity', 1))
+    
+    if not request.user.is_authenticated:
+        product = get_object_or_404(Product, id=item_id)
+        SessionCart(request).set(product.pk, quantity)
+        if quantity > 0:
+            messages.success(request, f'Updated {product.name} quantity.')
+        else:
+            messages.success(request, f'Removed {product.name} from your cart.')
+        return redirect('cart:cart_detail')
+    
+    cart_item = get_object_or_404(CartItem.objects.select_related('cart', 'product'), id=item_id)
     
     # Check if user owns this cart item
-    if request.user.is_authenticated and cart_item.cart.user != request.user:
+    if cart_item.cart.user != request.user:
         messages.error(request, 'You do not have permission to modify this cart.')
         return redirect('cart:cart_detail')
     
-    quantity = int(request.POST.get('quantity', 1))
     if quantity > 0:
-        cart_item.quantity = quantity
-        cart_item.save()
+        add_to_cart_count(request, quantity - cart_item.quantity)
+        # Writes only the quantity column, in place
+        CartItem.objects.filter(pk=cart_item.pk).update(quantity=quantity)
         messages.success(request, f'Updated {cart_item.product.name} quantity.')
     else:
         product_name = cart_item.product.name
         cart_item.delete()
+        add_to_cart_count(request, -cart_item.quantity)
         messages.success(request, f'Removed {product_name} from your cart.')
+    pricing.invalidate(cart_item.cart_id)
     
     return redirect('cart:cart_detail')
 
@@ -93,7 +122,7 @@ def wishlist(request):
     
     context = {
         'wishlist': wishlist,
-        'products': wishlist.products.all(),
+        'products': wishlist.products.cards(),
     }
     return render(request, 'cart/wishlist.html', context)
 
@@ -103,10 +132,12 @@ def add_to_wishlist(request, product_id):
     product = get_object_or_404(Product, id=product_id, is_available=True)
     wishlist, created = WishList.objects.get_or_create(user=request.user)
     
-    if product in wishlist.products.all():
+    # The cached ids only pick the message; add() itself skips products already there
+    already_added = is_wishlisted(request.user, product.pk)
+    wishlist.products.add(product)
+    if already_added:
         messages.info(request, f'{product.name} is already in your wishlist.')
     else:
-        wishlist.products.add(product)
         messages.success(request, f'Added {product.name} to your wishlist.')
     
     return redirect('products:product_detail', product_slug=product.slug)
@@ -117,8 +148,7 @@ def remove_from_wishlist(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     wishlist = get_object_or_404(WishList, user=request.user)
     
-    if product in wishlist.products.all():
-        wishlist.products.remove(product)
-        messages.success(request, f'Removed {product.name} from your wishlist.')
+    wishlist.products.remove(product)
+    messages.success(request, f'Removed {product.name} from your wishlist.')
     
     return redirect('cart:wishlist')
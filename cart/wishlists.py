@@ -0,0 +1,56 @@
+import time
+from django.core.cache import cache
+from .models import WishList
+
+# Any add or remove moves the version on, so the ids only need to outlive a browsing session
+IDS_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(user_id):
+    return f'cart:wishlist_version:user:{user_id}'
+
+
+def _key(user_id, version):
+    return f'cart:wishlist_ids:user:{user_id}:{version}'
+
+
+def _version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_wishlist_ids(user):
+    """
+    Ids of the products on the user's wishlist, as a set. Loaded with one
+    values_list query when the cache is cold, and remembered on the user
+    object so a listing page asking once per card hits the cache only once.
+
+    The set is stored under the version read before the query, so a read
+    racing with a change lands under a version nobody asks for again. It
+    is only good for display; writes must not be skipped on the strength of it.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, '_wishlist_ids', None)
+    if ids is None:
+        key = _key(user.pk, _version(user.pk))
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(WishList.products.through.objects.filter(
+                wishlist__user=user,
+            ).values_list('product_id', flat=True))
+            cache.set(key, ids, IDS_TIMEOUT)
+        user._wishlist_ids = ids
+    return ids
+
+
+def is_wishlisted(user, product_id):
+    return product_id in get_wishlist_ids(user)
+
+
+def invalidate(user_id):
+    cache.set(_version_key(user_id), time.time_ns(), None)
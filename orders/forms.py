@@ -23,4 +23,7 @@ class ShippingAddressForm(forms.Form):
     
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
-        super
\ No newline at end of file
+        super().__init__(*args, **kwargs)
+        addresses = Address.objects.filter(user=user) if user is not None else Address.objects.none()
+        self.fields['shipping_address'].queryset = addresses
+        self.fields['billing_address'].queryset = addresses
\ No newline at end of file
@@ -0,0 +1,116 @@
+from collections import Counter
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from products.models import Product
+from .models import Order
+
+# How long checkout holds stock for an order that has not been paid yet
+RESERVATION_TIMEOUT = timedelta(minutes=15)
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, quantity):
+        self.product_id = product_id
+        self.quantity = quantity
+        super().__init__(f'Not enough stock for product {product_id} (wanted {quantity}).')
+
+
+def _totals(lines):
+    totals = Counter()
+    for product_id, quantity in lines:
+        totals[product_id] += quantity
+    return totals
+
+
+class _Shortage(Exception):
+    pass
+
+
+def _quantity_case(totals):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in totals.items()],
+        output_field=models.PositiveIntegerField(),
+    )
+
+
+def take_stock(lines):
+    """
+    Decrement stock for every (product_id, quantity) line, all or nothing.
+
+    All lines go out as one conditional UPDATE (stock >= quantity per row),
+    so the cost is a single statement whatever the cart size, no row is read
+    before it is written, and rows stay locked only until commit. If fewer
+    rows matched than there are products, the statement is rolled back.
+    """
+    totals = _totals(lines)
+    if not totals:
+        return
+    quantity = _quantity_case(totals)
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(pk__in=totals, stock__gte=quantity).update(stock=F('stock') - quantity)
+            if updated != len(totals):
+                raise _Shortage
+    except _Shortage:
+        # Only on failure: find a product that is short, for the error message
+        stocks = dict(Product.objects.filter(pk__in=totals).values_list('pk', 'stock'))
+        product_id = next((pk for pk in sorted(totals) if stocks.get(pk, 0) < totals[pk]), min(totals))
+        raise OutOfStock(product_id, totals[product_id])
+
+
+def return_stock(lines):
+    totals = _totals(lines)
+    if totals:
+        quantity = _quantity_case(totals)
+        Product.objects.filter(pk__in=totals).update(stock=F('stock') + quantity)
+
+
+def _order_lines(order):
+    return order.items.values_list('product_id', 'quantity')
+
+
+def reserve(order, lines=None):
+    """Hold stock for an unpaid order until RESERVATION_TIMEOUT from now; raises OutOfStock"""
+    with transaction.atomic():
+        take_stock(lines if lines is not None else _order_lines(order))
+        order.stock_reserved_until = timezone.now() + RESERVATION_TIMEOUT
+        Order.objects.filter(pk=order.pk).update(stock_reserved_until=order.stock_reserved_until)
+
+
+def _claim(order):
+    """Atomically end the order's reservation; only one caller can win it"""
+    claimed = Order.objects.filter(pk=order.pk, stock_reserved_until__isnull=False).update(stock_reserved_until=None)
+    order.stock_reserved_until = None
+    return bool(claimed)
+
+
+def confirm(order):
+    """
+    Turn the reservation into a sale once payment succeeds. If the hold had
+    already been released (it timed out), stock is taken again, which may
+    raise OutOfStock.
+    """
+    with transaction.atomic():
+        if not _claim(order):
+            take_stock(_order_lines(order))
+
+
+def release(order):
+    """Put an unpaid order's stock back; a no-op if it holds none"""
+    with transaction.atomic():
+        if _claim(order):
+            return_stock(_order_lines(order))
+            return True
+    return False
+
+
+def release_expired(now=None):
+    """Release every pending order whose hold has run out; returns how many were released"""
+    now = now or timezone.now()
+    expired = Order.objects.filter(payment_status='pending', stock_reserved_until__lt=now)
+    released = 0
+    for order in expired.iterator():
+        released += release(order)
+    return released
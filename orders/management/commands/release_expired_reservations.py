@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from orders.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Return stock held by unpaid orders whose reservation has timed out'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Released stock for {released} orders.'))
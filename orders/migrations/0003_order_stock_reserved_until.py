@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved_until',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
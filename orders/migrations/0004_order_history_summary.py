@@ -0,0 +1,56 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_summaries(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by()
+    first_item = items.order_by('pk')
+    primary_image = ProductImage.objects.filter(product=OuterRef('product')).order_by('-is_primary', 'pk')
+    Order.objects.filter(pk__in=OrderItem.objects.values('order')).update(
+        item_count=Coalesce(Subquery(items.values('order').annotate(total=Sum('quantity')).values('total')), 0),
+        first_item_name=Coalesce(Subquery(first_item.values('product__name')[:1]), Value('')),
+        first_item_image=Coalesce(
+            Subquery(first_item.annotate(image=Subquery(primary_image.values('image')[:1])).values('image')[:1]),
+            Value(''),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_stock_reserved_until'),
+        ('products', '0006_product_effective_price'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='first_item_image',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='first_item_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_history_idx'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
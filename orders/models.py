@@ -1,3 +1,4 @@
+from django.core.files.storage import default_storage
 from django.db import models
 from users.models import CustomUser, Address
 from products.models import Product
@@ -28,11 +29,38 @@ class Order(models.Model):
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=50, blank=True, null=True)
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
+    # Set while checkout holds stock for the unpaid order (see orders.inventory)
+    stock_reserved_until = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Summary for order history, written at checkout so listing orders never touches their items
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    first_item_name = models.CharField(max_length=255, blank=True, editable=False)
+    first_item_image = models.CharField(max_length=100, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_history_idx'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets save signals tell when an order becomes paid or is refunded
+        if 'payment_status' in field_names:
+            instance._loaded_payment_status = instance.payment_status
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_payment_status = self.payment_status
+    
+    @property
+    def first_item_image_url(self):
+        return default_storage.url(self.first_item_image) if self.first_item_image else None
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -1,3 +1,192 @@
-from django.test import TestCase
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from cart.models import Cart, CartItem
+from products.models import Category
+from products.pagination import CursorPaginator
+from products.tests import create_product
+from users.models import Address, CustomUser
+from .models import Order, OrderItem
+from .views import ORDERS_PER_PAGE
+from . import inventory
 
-# Create your tests here.
+logger = logging.getLogger(__name__)
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.first = create_product(self.user, category, 'first', 10, stock=5)
+        self.second = create_product(self.user, category, 'second', 10, stock=1)
+        self.order = Order.objects.create(user=self.user, total_amount=0)
+        OrderItem.objects.create(order=self.order, product=self.first, quantity=2, price=10)
+        OrderItem.objects.create(order=self.order, product=self.second, quantity=1, price=10)
+
+    def assertStock(self, first, second):
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.stock, self.second.stock), (first, second))
+
+    def test_shortage_takes_nothing(self):
+        with self.assertRaises(inventory.OutOfStock) as cm:
+            inventory.take_stock([(self.first.pk, 2), (self.second.pk, 2)])
+        self.assertEqual(cm.exception.product_id, self.second.pk)
+        self.assertStock(5, 1)
+
+    def test_release_returns_stock_once(self):
+        inventory.reserve(self.order)
+        self.assertStock(3, 0)
+        self.assertTrue(inventory.release(self.order))
+        self.assertFalse(inventory.release(self.order))
+        self.assertStock(5, 1)
+
+    def test_confirm_keeps_stock(self):
+        inventory.reserve(self.order)
+        inventory.confirm(self.order)
+        self.assertFalse(inventory.release(self.order))
+        self.assertStock(3, 0)
+
+    def test_expired_reservations_are_released(self):
+        inventory.reserve(self.order)
+        self.assertEqual(inventory.release_expired(timezone.now() + timedelta(hours=1)), 1)
+        self.assertStock(5, 1)
+        # Paying after the timeout takes the stock again
+        inventory.confirm(self.order)
+        self.assertStock(3, 0)
+
+
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class StockReservationStressTest(TransactionTestCase):
+    WORKERS = 8
+    CHECKOUTS_PER_WORKER = 25
+    HOT_STOCK = 60
+
+    def test_concurrent_checkouts_never_oversell(self):
+        seller = CustomUser.objects.create_user(username='seller', password='secret')
+        category = Category.objects.create(name='Deals', slug='deals')
+        hot = create_product(seller, category, 'hot', 10, stock=self.HOT_STOCK)
+        other = create_product(seller, category, 'other', 10, stock=10000)
+
+        succeeded = []
+        rejected = []
+
+        def checkout_loop():
+            try:
+                for _ in range(self.CHECKOUTS_PER_WORKER):
+                    while True:
+                        try:
+                            inventory.take_stock([(other.pk, 2), (hot.pk, 1)])
+                            succeeded.append(1)
+                        except inventory.OutOfStock:
+                            rejected.append(1)
+                        except OperationalError:
+                            # SQLite's shared-cache test database reports lock
+                            # contention instead of waiting like a server would
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout_loop) for _ in range(self.WORKERS)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        hot.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(len(succeeded), self.HOT_STOCK)
+        self.assertEqual(len(rejected), self.WORKERS * self.CHECKOUTS_PER_WORKER - self.HOT_STOCK)
+        self.assertEqual(hot.stock, 0)
+        # Rejected checkouts must not leave their other lines decremented
+        self.assertEqual(other.stock, 10000 - 2 * self.HOT_STOCK)
+        logger.info(
+            '%.0f checkouts/sec with %d concurrent workers',
+            self.WORKERS * self.CHECKOUTS_PER_WORKER / elapsed, self.WORKERS,
+        )
+
+
+class CheckoutTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='buyer', password='secret')
+        self.address = Address.objects.create(
+            user=self.user, address_line1='1 Main St', city='Town', state='ST',
+            zip_code='00000', country='Country', is_default=True,
+        )
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [create_product(self.user, category, f'book-{i}', 10, stock=10) for i in range(20)]
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def fill_cart(self, lines):
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=quantity) for product, quantity in lines
+        ])
+
+    def checkout(self, lines=()):
+        self.fill_cart(lines)
+        return self.client.post(reverse('orders:checkout'), {
+            'shipping_address': self.address.pk,
+            'billing_address': self.address.pk,
+            'payment_method': 'credit_card',
+        })
+
+    def test_checkout_creates_order_and_clears_cart(self):
+        response = self.checkout([(self.products[0], 2), (self.products[1], 1)])
+        self.assertRedirects(response, reverse('orders:payment'), fetch_redirect_response=False)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(sorted(order.items.values_list('product_id', 'quantity')), [
+            (self.products[0].pk, 2), (self.products[1].pk, 1),
+        ])
+        self.assertIsNotNone(order.stock_reserved_until)
+        self.assertFalse(self.cart.items.exists())
+        self.assertEqual((order.item_count, order.first_item_name), (3, self.products[0].name))
+        # Filed under the one seller with the seller's share of the order
+        self.assertEqual(list(order.seller_orders.values_list('seller', 'subtotal')), [(self.user.pk, Decimal('30.00'))])
+
+    def test_query_count_is_independent_of_cart_size(self):
+        for size in (1, 20):
+            with self.subTest(size=size):
+                self.fill_cart([(product, 1) for product in self.products[:size]])
+                # Session and user loading, the cart, the form's address
+                # lookups, then one statement each for the order, its items,
+                # the sellers' shares, the stock update, the reservation and
+                # emptying the cart
+                with self.assertNumQueries(24):
+                    self.checkout()
+                self.assertEqual(Order.objects.latest('pk').items.count(), size)
+
+    def test_shortage_creates_no_order(self):
+        response = self.checkout([(self.products[0], 11), (self.products[1], 1)])
+        self.assertRedirects(response, reverse('cart:cart_detail'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[1].stock, 10)
+
+
+class OrderHistoryTest(TestCase):
+    def test_each_page_is_one_query(self):
+        user = CustomUser.objects.create_user(username='buyer', password='secret')
+        Order.objects.bulk_create([Order(user=user, total_amount=10, item_count=1) for _ in range(25)])
+        paginator = CursorPaginator(Order.objects.filter(user=user), ORDERS_PER_PAGE, ordering='-created_at')
+        with self.assertNumQueries(1):
+            first = list(paginator.page(None))
+        cursor = paginator.page(None).next_cursor
+        with self.assertNumQueries(1):
+            second = list(paginator.page(cursor))
+        self.assertEqual(len(first) + len(second), 25)
+        self.assertFalse({order.pk for order in first} & {order.pk for order in second})
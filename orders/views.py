@@ -1,19 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from .models import Order, OrderItem, Payment
+from . import inventory
 from .forms import ShippingAddressForm
-from cart.models import Cart
+from cart.models import Cart, CartItem
+from cart.counts import reset_cart_count
+from cart import pricing
+from sellers import rollups
+from products.models import Product, ProductImage
+from products.pagination import CursorPaginator
 from users.models import Address
 from django.conf import settings
 import time
 
+ORDERS_PER_PAGE = 20
+
 @login_required
 def checkout(request):
     """View for the checkout process"""
     try:
         cart = Cart.objects.get(user=request.user)
-        if cart.items.count() == 0:
+        if not cart.items.exists():
             messages.warning(request, 'Your cart is empty. Add some products before checking out.')
             return redirect('cart:cart_detail')
     except Cart.DoesNotExist:
@@ -25,53 +35,35 @@ def checkout(request):
     default_address = addresses.filter(is_default=True).first()
     
     if request.method == 'POST':
-        form = ShippingAddressForm(request.POST)
+        form = ShippingAddressForm(request.POST, user=request.user)
         if form.is_valid():
-            shipping_address_id = form.cleaned_data.get('shipping_address')
-            billing_address_id = form.cleaned_data.get('billing_address')
-            payment_method = form.cleaned_data.get('payment_method')
-            
-            shipping_address = get_object_or_404(Address, id=shipping_address_id, user=request.user)
-            billing_address = get_object_or_404(Address, id=billing_address_id, user=request.user)
-            
-            # Calculate totals
-            cart_items = cart.items.all()
-            total = sum(item.total_price for item in cart_items)
-            shipping_amount = 10.00  # Example shipping fee
-            tax_amount = total * 0.1  # Example tax calculation (10%)
-            grand_total = total + shipping_amount + tax_amount
+            try:
+                order = _place_order(
+                    request.user,
+                    cart,
+                    shipping_address=form.cleaned_data['shipping_address'],
+                    billing_address=form.cleaned_data['billing_address'],
+                    payment_method=form.cleaned_data['payment_method'],
+                )
+            except inventory.OutOfStock as e:
+                product_name = Product.objects.filter(pk=e.product_id).values_list('name', flat=True).first()
+                messages.error(request, f'Sorry, there is not enough stock left for {product_name}.')
+                return redirect('cart:cart_detail')
             
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                shipping_address=shipping_address,
-                billing_address=billing_address,
-                total_amount=grand_total,
-                shipping_amount=shipping_amount,
-                tax_amount=tax_amount,
-                payment_method=payment_method,
-                status='pending'
-            )
+            if order is None:
+                # Another request checked this cart out first
+                messages.warning(request, 'Your cart is empty. Add some products before checking out.')
+                return redirect('cart:cart_detail')
             
-            # Create order items
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
+            reset_cart_count(request)
             
             # Store order ID in session for payment process
             request.session['order_id'] = order.id
             
-            # Clear cart
-            cart.items.all().delete()
-            
             # Redirect to payment page
             return redirect('orders:payment')
     else:
-        form = ShippingAddressForm(initial={
+        form = ShippingAddressForm(user=request.user, initial={
             'shipping_address': default_address.id if default_address else None,
             'billing_address': default_address.id if default_address else None,
         })
@@ -80,10 +72,72 @@ def checkout(request):
         'form': form,
         'addresses': addresses,
         'cart': cart,
-        'cart_items': cart.items.all(),
+        'cart_items': cart.items.select_related('product'),
+        'totals': pricing.get_cart_totals(cart),
     }
     return render(request, 'orders/checkout.html', context)
 
+def _place_order(user, cart, shipping_address, billing_address, payment_method):
+    """
+    Turn the cart into an order in one transaction and a fixed number of
+    queries: lock the cart, read its lines once, insert the order and all of
+    its items, reserve stock and empty the cart. Returns None if the cart
+    turned out to be empty.
+    """
+    with transaction.atomic():
+        # Serializes concurrent checkouts of the same cart (e.g. a double submit)
+        Cart.objects.select_for_update().filter(pk=cart.pk).first()
+        primary_image = ProductImage.objects.filter(
+            product=OuterRef('product')
+        ).order_by('-is_primary', 'pk').values('image')[:1]
+        cart_items = list(cart.items.select_related('product').annotate(
+            primary_image=Subquery(primary_image),
+        ).order_by('pk'))
+        if not cart_items:
+            return None
+        
+        # Priced from the rows just read, never from the cache, so the order
+        # charges what the products cost at this moment
+        totals = pricing.CartTotals.from_items(cart_items)
+        
+        # Create order
+        order = Order.objects.create(
+            user=user,
+            shipping_address=shipping_address,
+            billing_address=billing_address,
+            total_amount=totals.total,
+            shipping_amount=totals.shipping,
+            tax_amount=totals.tax,
+            payment_method=payment_method,
+            status='pending',
+            item_count=totals.item_count,
+            first_item_name=cart_items[0].product.name,
+            first_item_image=cart_items[0].primary_image or '',
+        )
+        
+        # Create order items
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=cart_item.product,
+                quantity=cart_item.quantity,
+                price=cart_item.product.effective_price
+            )
+            for cart_item in cart_items
+        ])
+        # Each seller's share of the order, for their order list
+        rollups.record_seller_orders(order, [
+            (item.product.seller_id, item.quantity, item.product.effective_price) for item in cart_items
+        ])
+        
+        # Hold stock for every line until the order is paid or the hold expires
+        inventory.reserve(order, [(item.product_id, item.quantity) for item in cart_items])
+        
+        # Clear cart
+        CartItem.objects.filter(cart=cart).delete()
+        pricing.invalidate(cart.pk)
+    return order
+
 @login_required
 def payment(request):
     """Payment processing page"""
@@ -95,21 +149,37 @@ def payment(request):
     order = get_object_or_404(Order, id=order_id, user=request.user)
     
     if request.method == 'POST':
+        # A hold released by an earlier failed attempt or by the timeout has to be taken again
+        if order.stock_reserved_until is None:
+            try:
+                inventory.reserve(order)
+            except inventory.OutOfStock:
+                messages.error(request, 'Sorry, some items in this order are no longer in stock.')
+                return redirect('cart:cart_detail')
+        
         # Simulate payment processing
         success = True  # In a real app, this would be determined by payment gateway response
         
         if success:
-            # Create payment record
-            Payment.objects.create(
-                order=order,
-                payment_id=f"PAY-{order.id}-{int(time.time())}",  # Generate a dummy payment ID
-                amount=order.total_amount
-            )
-            
-            # Update order status
-            order.payment_status = 'completed'
-            order.status = 'processing'
-            order.save()
+            try:
+                with transaction.atomic():
+                    # Keep the reserved stock as sold
+                    inventory.confirm(order)
+                    
+                    # Create payment record
+                    Payment.objects.create(
+                        order=order,
+                        payment_id=f"PAY-{order.id}-{int(time.time())}",  # Generate a dummy payment ID
+                        amount=order.total_amount
+                    )
+                    
+                    # Update order status
+                    order.payment_status = 'completed'
+                    order.status = 'processing'
+                    order.save()
+            except inventory.OutOfStock:
+                messages.error(request, 'Sorry, some items in this order are no longer in stock.')
+                return redirect('cart:cart_detail')
             
             # Clear session data
             if 'order_id' in request.session:
@@ -118,6 +188,8 @@ def payment(request):
             messages.success(request, 'Payment processed successfully!')
             return redirect('orders:order_confirmation', order_id=order.id)
         else:
+            # Don't hold stock for a payment that may never be retried
+            inventory.release(order)
             messages.error(request, 'Payment processing failed. Please try again.')
     
     context = {
@@ -139,7 +211,9 @@ def order_confirmation(request, order_id):
 @login_required
 def order_history(request):
     """View to display user's order history"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    # One range scan on order_history_idx per page; the summary columns save touching order items
+    paginator = CursorPaginator(Order.objects.filter(user=request.user), ORDERS_PER_PAGE, ordering='-created_at')
+    orders = paginator.page(request.GET.get('cursor'))
     
     context = {
         'orders': orders,
@@ -0,0 +1,67 @@
+import time
+from django.core.cache import cache
+from .models import Category
+
+VERSION_KEY = 'products:category_tree:version'
+
+
+class CategoryTree:
+    """Immutable snapshot of every category, indexed for breadcrumbs and navigation"""
+
+    def __init__(self, categories, version):
+        self.version = version
+        self.by_id = {category.id: category for category in categories}
+        self.by_slug = {category.slug: category for category in categories}
+        self._children = {}
+        for category in categories:
+            self._children.setdefault(category.parent_id, []).append(category)
+
+    @classmethod
+    def load(cls, version):
+        return cls(list(Category.objects.order_by('name')), version)
+
+    @property
+    def roots(self):
+        return self._children.get(None, [])
+
+    def get(self, category_id):
+        return self.by_id.get(category_id)
+
+    def children(self, category):
+        return self._children.get(category.id, [])
+
+    def ancestors(self, category):
+        """Categories from the root down to the parent of category"""
+        return [self.by_id[category_id] for category_id in category.get_ancestor_ids() if category_id in self.by_id]
+
+    def breadcrumbs(self, category):
+        return self.ancestors(category) + [category]
+
+    def descendant_ids(self, category):
+        ids = []
+        stack = [category]
+        while stack:
+            node = stack.pop()
+            ids.append(node.id)
+            stack.extend(self.children(node))
+        return ids
+
+
+_tree = None
+
+
+def get_tree():
+    """Return the process-local tree, reloading it once another process or a save has bumped the version"""
+    global _tree
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    if _tree is None or _tree.version != version:
+        _tree = CategoryTree.load(version)
+    return _tree
+
+
+def invalidate():
+    cache.set(VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,8 @@
+from . import category_tree
+
+
+def categories(request):
+    """Top-level categories for the site navigation, from the process-local category tree"""
+    return {
+        'categories': category_tree.get_tree().roots,
+    }
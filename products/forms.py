@@ -1,6 +1,6 @@
 from django import forms
 from .models import ProductReview, Product
-from django.utils.text import slugify
+from .slugs import unique_slugs
 
 class ProductReviewForm(forms.ModelForm):
     class Meta:
@@ -48,13 +48,7 @@ class ProductForm(forms.ModelForm):
         instance = super().save(commit=False)
         
         if not instance.slug:
-            base_slug = slugify(instance.name)
-            slug = base_slug
-            counter = 1
-            while Product.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            instance.slug = slug
+            instance.slug = unique_slugs([instance.name])[0]
         
         if commit:
             instance.save()
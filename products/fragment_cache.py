@@ -0,0 +1,79 @@
+import time
+from django.core.cache import cache
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Home page blocks
+FEATURED_PRODUCTS_FRAGMENT = 'home:featured_products'
+ROOT_CATEGORIES_FRAGMENT = 'home:root_categories'
+
+# How long one request may hold the rebuild lock, and how long others wait for it
+# when there is no stale copy to serve in the meantime
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+WAIT_ATTEMPTS = 40
+
+
+def _key(name):
+    return f'products:fragment:{name}'
+
+
+def _version_key(name):
+    return f'products:fragment_version:{name}'
+
+
+def _lock_key(name):
+    return f'products:fragment_lock:{name}'
+
+
+def _current_version(name):
+    version = cache.get(_version_key(name))
+    if version is None:
+        cache.add(_version_key(name), time.time_ns(), None)
+        version = cache.get(_version_key(name))
+    return version
+
+
+def peek(name):
+    """The cached entry for name, current or stale, without rebuilding it"""
+    return cache.get(_key(name))
+
+
+def invalidate(name):
+    """Mark the fragment stale; it keeps being served until one request has rebuilt it"""
+    cache.set(_version_key(name), time.time_ns(), None)
+
+
+def get_fragment(name, build):
+    """
+    Return the cached entry for name, calling build() to produce a new dict
+    when it is missing or stale.
+
+    Only the request that wins the lock rebuilds. Everyone else keeps getting
+    the stale entry, or waits for the winner when there is none, so a miss
+    under load costs one rebuild instead of one per request.
+    """
+    version = _current_version(name)
+    entry = cache.get(_key(name))
+    if entry is not None and entry['version'] == version:
+        return entry
+
+    if cache.add(_lock_key(name), True, LOCK_TIMEOUT):
+        try:
+            entry = dict(build(), version=version)
+            cache.set(_key(name), entry, FRAGMENT_TIMEOUT)
+        finally:
+            cache.delete(_lock_key(name))
+        return entry
+
+    if entry is not None:
+        return entry
+
+    for _ in range(WAIT_ATTEMPTS):
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(_key(name))
+        if entry is not None:
+            return entry
+
+    # The rebuilding request is stuck or gone; render without caching
+    return dict(build(), version=version)
@@ -0,0 +1,157 @@
+import csv
+import io
+import json
+import time
+from django import forms
+from django.db import IntegrityError, transaction
+from .fragment_cache import FEATURED_PRODUCTS_FRAGMENT
+from .models import Category, Product
+from .slugs import unique_slugs
+from . import fragment_cache, search
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = 1000
+
+# Only this many row errors are kept for the report; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class InvalidImportFile(Exception):
+    pass
+
+
+class ProductRowForm(forms.Form):
+    """Validates one imported row; categories are resolved from a preloaded map instead of a query per row"""
+    category = forms.CharField()
+    name = forms.CharField(max_length=255)
+    description = forms.CharField()
+    price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    discount_price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock = forms.IntegerField(min_value=0, required=False)
+    is_available = forms.NullBooleanField(required=False)
+
+    def __init__(self, *args, categories, **kwargs):
+        self.categories = categories
+        super().__init__(*args, **kwargs)
+
+    def clean_category(self):
+        value = self.cleaned_data['category'].strip()
+        if value not in self.categories:
+            raise forms.ValidationError(f'Unknown category "{value}".')
+        return self.categories[value]
+
+
+def read_rows(stream, format):
+    """Yield (line number, row dict) from a binary or text stream without reading it all into memory"""
+    if format not in FORMATS:
+        raise InvalidImportFile(f'Unsupported format "{format}", expected one of: {", ".join(FORMATS)}.')
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'__error__': f'Invalid JSON: {e}'}
+            yield line_number, row if isinstance(row, dict) else {'__error__': 'Expected a JSON object.'}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, errors))
+
+    @property
+    def rows(self):
+        return self.created + self.failed
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+
+class ProductImporter:
+    """
+    Creates products for one seller from a stream of rows, validating each
+    row and writing valid ones with bulk_create, one transaction per chunk.
+    """
+
+    def __init__(self, seller, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.seller = seller
+        self.chunk_size = chunk_size
+        # Rows may name a category by slug or by id
+        self.categories = {}
+        for category_id, slug in Category.objects.values_list('id', 'slug'):
+            self.categories[slug] = category_id
+            self.categories[str(category_id)] = category_id
+        self.reserved_slugs = set()
+
+    def run(self, rows):
+        result = ImportResult()
+        chunk = []
+        for line, row in rows:
+            product = self._build(line, row, result)
+            if product is not None:
+                chunk.append((line, product))
+            if len(chunk) >= self.chunk_size:
+                self._write(chunk, result)
+                chunk = []
+        if chunk:
+            self._write(chunk, result)
+        result.elapsed = time.monotonic() - result.started
+        return result
+
+    def _build(self, line, row, result):
+        if '__error__' in row:
+            result.add_error(line, {'__all__': [row['__error__']]})
+            return None
+        form = ProductRowForm(row, categories=self.categories)
+        if not form.is_valid():
+            result.add_error(line, {field: list(errors) for field, errors in form.errors.items()})
+            return None
+        data = form.cleaned_data
+        return Product(
+            seller=self.seller,
+            category_id=data['category'],
+            name=data['name'],
+            description=data['description'],
+            price=data['price'],
+            discount_price=data['discount_price'],
+            effective_price=data['discount_price'] if data['discount_price'] is not None else data['price'],
+            stock=data['stock'] or 0,
+            is_available=data['is_available'] is not False,
+        )
+
+    def _write(self, chunk, result):
+        products = [product for _, product in chunk]
+        try:
+            with transaction.atomic():
+                for product, slug in zip(products, unique_slugs([p.name for p in products], self.reserved_slugs)):
+                    product.slug = slug
+                created = Product.objects.bulk_create(products)
+                # bulk_create skips save signals, so index the chunk here
+                search.index_products([product.pk for product in created])
+        except IntegrityError as e:
+            for line, _ in chunk:
+                result.add_error(line, {'__all__': [f'Chunk rejected by the database: {e}']})
+            return
+        result.created += len(created)
+        if any(product.is_available for product in created):
+            transaction.on_commit(lambda: fragment_cache.invalidate(FEATURED_PRODUCTS_FRAGMENT))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import DEFAULT_CHUNK_SIZE, FORMATS, InvalidImportFile, ProductImporter, read_rows
+from sellers import seller_context
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Stream products for a seller from a CSV or JSONL file into the catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSONL file')
+        parser.add_argument('--seller', required=True, help='Username of the seller who owns the products')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows written per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            seller = CustomUser.objects.get(username=options['seller'], user_type='seller')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'No seller with username "{options["seller"]}".')
+
+        format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        importer = ProductImporter(seller, chunk_size=options['chunk_size'])
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = importer.run(read_rows(stream, format))
+        except (OSError, InvalidImportFile) as e:
+            raise CommandError(str(e))
+        if result.created:
+            seller_context.invalidate(seller.pk)
+
+        for line, errors in result.errors:
+            for field, messages in errors.items():
+                self.stderr.write(f'Line {line}: {field}: {" ".join(messages)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} products, {result.failed} rows failed '
+            f'({result.rows_per_second:.0f} rows/sec).'
+        ))
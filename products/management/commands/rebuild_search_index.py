@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from products.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index from the products table'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not backend.ranked:
+            self.stdout.write(self.style.WARNING(
+                'No full-text index is available for this database; search falls back to icontains.'
+            ))
+            return
+
+        with transaction.atomic():
+            backend.create()
+            count = backend.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products.'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models import Avg, Count, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from products.models import Product, ProductReview
+
+
+def recompute_ratings(products):
+    """Overwrite the stored review aggregates of products with values computed from ProductReview"""
+    reviews = ProductReview.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    return products.update(
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0,
+            output_field=models.PositiveIntegerField(),
+        ),
+        review_count=Coalesce(
+            Subquery(reviews.annotate(total=Count('pk')).values('total')), 0,
+            output_field=models.PositiveIntegerField(),
+        ),
+        average_rating=Coalesce(
+            Subquery(reviews.annotate(average=Avg('rating')).values('average')), 0,
+            output_field=models.DecimalField(max_digits=3, decimal_places=2),
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized product rating aggregates from reviews, in id-range batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Product.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No products to recompute.')
+            return
+
+        updated = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            updated += recompute_ratings(Product.objects.filter(pk__gte=start, pk__lt=start + batch_size))
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings for {updated} products.'))
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from products.search import get_backend
+    backend = get_backend(schema_editor.connection)
+    backend.create()
+    backend.rebuild()
+
+
+def drop_search_index(apps, schema_editor):
+    from products.search import get_backend
+    get_backend(schema_editor.connection).drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.only('id', 'parent_id'))
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+
+    # Walk the tree from the roots so every parent's path is known before its children
+    stack = [(category, '') for category in children.get(None, [])]
+    while stack:
+        category, parent_path = stack.pop()
+        category.path = parent_path + '{:08d}/'.format(category.id)
+        stack.extend((child, category.path) for child in children.get(category.id, []))
+
+    Category.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 07:27
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models import Max, Min
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 5000
+
+
+def backfill_effective_price(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    bounds = Product.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    # One short transaction per id range so large tables are never locked as a whole
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        with transaction.atomic():
+            Product.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE).update(
+                effective_price=Coalesce('discount_price', 'price')
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('products', '0005_product_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(backfill_effective_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', 'category', 'effective_price'], name='product_listing_price_idx'),
+        ),
+    ]
@@ -1,18 +1,75 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import Case, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, Substr
+from django.utils import timezone
 from users.models import CustomUser
 
 class Category(models.Model):
+    # Each level of the materialized path is the zero-padded id followed by a separator
+    PATH_SEGMENT_FORMAT = '{:08d}/'
+    
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='category_images', blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='children')
+    # Ids of all ancestors and this category, root first, e.g. "00000001/00000007/"
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
     
     class Meta:
         verbose_name_plural = 'Categories'
     
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        if self.pk and self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValidationError({'parent': 'A category cannot be moved under itself or one of its subcategories.'})
+    
+    def save(self, *args, **kwargs):
+        if self.pk and self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValueError('A category cannot be moved under itself or one of its subcategories.')
+        super().save(*args, **kwargs)
+        
+        old_path = self.path
+        new_path = (self.parent.path if self.parent_id else '') + self.PATH_SEGMENT_FORMAT.format(self.pk)
+        if new_path != old_path:
+            Category.objects.filter(pk=self.pk).update(path=new_path)
+            if old_path:
+                # Moved: rewrite the path prefix of the whole subtree in one statement
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+                )
+            self.path = new_path
+    
+    def get_descendants(self, include_self=True):
+        """Queryset of this category's subtree at any depth, as a prefix match on path"""
+        # LIKE 'prefix%' rather than a range, whose bounds would depend on the
+        # database collation; PostgreSQL indexes it with varchar_pattern_ops
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+    
+    def get_ancestor_ids(self):
+        """Ids from the root down to the parent, read from the path without a query"""
+        return [int(segment) for segment in self.path.split('/')[:-2]]
+
+class ProductQuerySet(models.QuerySet):
+    def cards(self):
+        """
+        Everything a product card renders, in one query: the category name
+        and primary image path are annotated rather than fetched per product.
+        """
+        primary_image = ProductImage.objects.filter(
+            product=OuterRef('pk')
+        ).order_by('-is_primary', 'pk').values('image')[:1]
+        return self.annotate(
+            category_name=F('category__name'),
+            primary_image=Subquery(primary_image),
+        )
 
 class Product(models.Model):
     seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='products')
@@ -24,11 +81,76 @@ class Product(models.Model):
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     stock = models.PositiveIntegerField(default=0)
     is_available = models.BooleanField(default=True)
+    # discount_price when set, else price; stored so listings can filter and sort on an index
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Review aggregates, kept in step with ProductReview writes (see apply_rating_change)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    
+    objects = ProductQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_available', 'category', 'effective_price'], name='product_listing_price_idx'),
+            models.Index(fields=['seller', 'created_at'], name='product_seller_created_idx'),
+        ]
     
     def __str__(self):
         return self.name
+    
+    @staticmethod
+    def effective_price_expression():
+        """effective_price as a SQL expression, for bulk update() paths that bypass save()"""
+        return Coalesce('discount_price', 'price')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets save signals tell when a product enters or leaves the storefront
+        if 'is_available' in field_names:
+            instance._loaded_is_available = instance.is_available
+        if 'effective_price' in field_names:
+            instance._loaded_effective_price = instance.effective_price
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.effective_price = self.discount_price if self.discount_price is not None else self.price
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'price', 'discount_price'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'effective_price'}
+        super().save(*args, **kwargs)
+        self._loaded_is_available = self.is_available
+        self._loaded_effective_price = self.effective_price
+    
+    @property
+    def primary_image_url(self):
+        """URL of the primary (or first) image, from the cards() annotation when present"""
+        if hasattr(self, 'primary_image'):
+            name = self.primary_image
+        else:
+            image = self.images.order_by('-is_primary', 'pk').first()
+            name = image.image.name if image else None
+        return default_storage.url(name) if name else None
+    
+    @classmethod
+    def apply_rating_change(cls, product_id, rating_delta, count_delta):
+        """Adjust the stored review aggregates in a single UPDATE relative to the current row values"""
+        new_sum = F('rating_sum') + rating_delta
+        new_count = F('review_count') + count_delta
+        cls.objects.filter(pk=product_id).update(
+            # Reviews are part of the product page, so they count as a modification
+            updated_at=timezone.now(),
+            rating_sum=new_sum,
+            review_count=new_count,
+            average_rating=Case(
+                When(review_count__lte=-count_delta, then=Value(0)),
+                default=Cast(new_sum, FloatField()) / new_count,
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -49,4 +171,27 @@ class ProductReview(models.Model):
         unique_together = ('product', 'user')
     
     def __str__(self):
-        return f"Review by {self.user.username} for {self.product.name}"
\ No newline at end of file
+        return f"Review by {self.user.username} for {self.product.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the product aggregates currently include for this review
+        if 'product_id' in field_names and 'rating' in field_names:
+            instance._loaded = (instance.product_id, instance.rating)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            loaded = getattr(self, '_loaded', None)
+            if loaded is None and not self._state.adding:
+                loaded = ProductReview.objects.filter(pk=self.pk).values_list('product_id', 'rating').first()
+            super().save(*args, **kwargs)
+            if loaded is None:
+                Product.apply_rating_change(self.product_id, self.rating, 1)
+            elif loaded[0] != self.product_id:
+                Product.apply_rating_change(loaded[0], -loaded[1], -1)
+                Product.apply_rating_change(self.product_id, self.rating, 1)
+            elif loaded[1] != self.rating:
+                Product.apply_rating_change(self.product_id, self.rating - loaded[1], 0)
+            self._loaded = (self.product_id, self.rating)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import hashlib
+import time
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+# Pages are dropped on invalidation anyway; the timeout only bounds memory for cold products
+PAGE_TIMEOUT = 60 * 60
+
+
+def _version_key(slug):
+    return f'products:page_version:{slug}'
+
+
+def _page_key(slug, version):
+    return f'products:page:{slug}:{version}'
+
+
+def is_cacheable(request):
+    """Only anonymous GETs with no pending flash messages see the same page as everyone else"""
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def get_version(slug):
+    """
+    Current version stamp of a product page. A render stores its result under
+    the version read before it queried the database, so a change committed
+    mid-render leaves the stale page under a version nobody asks for again.
+    """
+    key = _version_key(slug)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(slug):
+    cache.set(_version_key(slug), time.time_ns(), None)
+
+
+def invalidate_many(slugs):
+    """invalidate() for a batch of pages in one cache round-trip"""
+    version = time.time_ns()
+    cache.set_many({_version_key(slug): version for slug in slugs}, None)
+
+
+def _finalize(request, response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0)
+    patch_vary_headers(response, ('Cookie',))
+    # Cached pages hold no CSRF token, so their POST forms read it from the
+    # cookie (see base.html); a visitor without one gets it here, on a
+    # response that shared caches must then not keep
+    if settings.CSRF_COOKIE_NAME not in request.COOKIES:
+        get_token(request)
+        patch_cache_control(response, private=True)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+
+def get_response(request, slug, version):
+    """Serve a cached page (or a 304 for it), or None on a miss"""
+    entry = cache.get(_page_key(slug, version))
+    if entry is None:
+        return None
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    return _finalize(request, response, entry['etag'], entry['last_modified'])
+
+
+def store_response(request, slug, version, response, last_modified):
+    """
+    Cache a freshly rendered page and add validators to it. A page that
+    rendered {% csrf_token %} is specific to this visitor and is never
+    stored, so templates for cached pages leave the tag out of their forms.
+    """
+    # Checked before _finalize, which asks for a token itself
+    if response.status_code != 200 or response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return response
+
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    last_modified = int(last_modified.timestamp())
+    cache.set(_page_key(slug, version), {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': etag,
+        'last_modified': last_modified,
+    }, PAGE_TIMEOUT)
+    return _finalize(request, response, etag, last_modified)
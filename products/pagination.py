@@ -0,0 +1,135 @@
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """One page of a CursorPaginator, shaped like django.core.paginator.Page for templates"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+class CursorPaginator:
+    """
+    Keyset paginator ordered on a single non-null column plus the primary key.
+
+    Pages are addressed by opaque cursors instead of page numbers, so every page
+    is an indexed range scan and no COUNT(*) is needed to render it. When
+    count_limit is set, count is only exact up to that many rows.
+    """
+
+    def __init__(self, queryset, per_page, ordering='-created_at', count_limit=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        queryset = self.queryset.order_by()
+        if self.count_limit:
+            return queryset[:self.count_limit + 1].count()
+        return queryset.count()
+
+    @property
+    def count_is_estimate(self):
+        return bool(self.count_limit) and self.count > self.count_limit
+
+    def _ordering(self, reverse=False):
+        prefix = '-' if self.descending != reverse else ''
+        return [f'{prefix}{self.field_name}', f'{prefix}pk']
+
+    def _encode_value(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def encode_cursor(self, obj, direction):
+        payload = [direction, self._encode_value(getattr(obj, self.field_name)), obj.pk]
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, value, pk = json.loads(data)
+            if direction not in ('next', 'prev'):
+                raise InvalidCursor(cursor)
+            return direction, self.field.to_python(value), int(pk)
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def page(self, cursor=None):
+        """Return the page after (or before) the row encoded in cursor; the first page if cursor is empty or invalid"""
+        try:
+            direction, value, pk = self.decode_cursor(cursor) if cursor else (None, None, None)
+        except InvalidCursor:
+            direction = None
+
+        queryset = self.queryset
+        backwards = direction == 'prev'
+        if direction:
+            # Rows strictly beyond the cursor in the direction of travel
+            lookup = 'lt' if self.descending != backwards else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{lookup}': value}) |
+                Q(**{self.field_name: value, f'pk__{lookup}': pk})
+            )
+
+        rows = list(queryset.order_by(*self._ordering(reverse=backwards))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            if not rows:
+                return self.page()
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=has_more)
+        return CursorPage(rows, self, has_next=has_more, has_previous=direction is not None)
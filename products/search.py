@@ -0,0 +1,234 @@
+import re
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_TABLE = 'products_product_fts'
+
+# Product ids per DELETE when removing products from the SQLite index
+REMOVE_BATCH_SIZE = 900
+
+# Words are pulled out of the raw query so user input never reaches the
+# FTS query parser as syntax
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _terms(query):
+    return WORD_RE.findall(query.lower())
+
+
+class FallbackSearchBackend:
+    """Plain icontains search for databases without a full-text index"""
+    vendor = None
+    ranked = False
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        pass
+
+    def drop(self):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def index(self, product_ids):
+        pass
+
+    def index_category(self, category_id):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query)
+        ).distinct()
+
+
+class SQLiteSearchBackend(FallbackSearchBackend):
+    """FTS5 virtual table keyed on the product id, ranked with bm25"""
+    vendor = 'sqlite'
+    ranked = True
+
+    # Column weights for bm25: name, description, category
+    weights = (10.0, 1.0, 5.0)
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+                f"USING fts5(name, description, category, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def _populate(self, cursor, where='', params=()):
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, description, category) "
+            f"SELECT p.id, p.name, p.description, c.name "
+            f"FROM products_product p JOIN products_category c ON c.id = p.category_id {where}",
+            params
+        )
+        return cursor.rowcount
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+            return self._populate(cursor)
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+            self._populate(cursor, f"WHERE p.id IN ({placeholders})", product_ids)
+
+    def index_category(self, category_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+                f"(SELECT id FROM products_product WHERE category_id = %s)",
+                [category_id]
+            )
+            self._populate(cursor, "WHERE p.category_id = %s", [category_id])
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        with self.connection.cursor() as cursor:
+            # Batched, since bulk deletes can pass more ids than SQLite allows parameters
+            for start in range(0, len(product_ids), REMOVE_BATCH_SIZE):
+                batch = product_ids[start:start + REMOVE_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch)
+
+    def search(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        # Prefix match on every term so results update while the user types
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            select={'search_rank': f"-bm25({SEARCH_TABLE}, {weights})"},
+            tables=[SEARCH_TABLE],
+            where=[f"{SEARCH_TABLE}.rowid = products_product.id", f"{SEARCH_TABLE} MATCH %s"],
+            params=[match],
+        )
+
+
+class PostgreSQLSearchBackend(FallbackSearchBackend):
+    """tsvector table with a GIN index, ranked with ts_rank"""
+    vendor = 'postgresql'
+    ranked = True
+    # Unstemmed lexemes so prefix queries match partially typed words
+    config = 'simple'
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                f"product_id bigint PRIMARY KEY REFERENCES products_product (id) "
+                f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx "
+                f"ON {SEARCH_TABLE} USING gin (document)"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def _populate(self, cursor, where='', params=()):
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, document) "
+            f"SELECT p.id, "
+            f"setweight(to_tsvector('{self.config}', p.name), 'A') || "
+            f"setweight(to_tsvector('{self.config}', c.name), 'B') || "
+            f"setweight(to_tsvector('{self.config}', p.description), 'C') "
+            f"FROM products_product p JOIN products_category c ON c.id = p.category_id {where} "
+            f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            params
+        )
+        return cursor.rowcount
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+            return self._populate(cursor)
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with self.connection.cursor() as cursor:
+                self._populate(cursor, "WHERE p.id = ANY(%s)", [product_ids])
+
+    def index_category(self, category_id):
+        with self.connection.cursor() as cursor:
+            self._populate(cursor, "WHERE p.category_id = %s", [category_id])
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [product_ids])
+
+    def search(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.extra(
+            select={
+                'search_rank': f"ts_rank({SEARCH_TABLE}.document, to_tsquery('{self.config}', %s))",
+            },
+            select_params=[tsquery],
+            tables=[SEARCH_TABLE],
+            where=[
+                f"{SEARCH_TABLE}.product_id = products_product.id",
+                f"{SEARCH_TABLE}.document @@ to_tsquery('{self.config}', %s)",
+            ],
+            params=[tsquery],
+        )
+
+
+BACKENDS = {
+    backend.vendor: backend for backend in (SQLiteSearchBackend, PostgreSQLSearchBackend)
+}
+
+
+def get_backend(conn=None):
+    """Return the search backend for the given (or default) connection"""
+    conn = conn or connection
+    return BACKENDS.get(conn.vendor, FallbackSearchBackend)(conn)
+
+
+def search(queryset, query):
+    """Restrict a Product queryset to matches for query, annotated with search_rank when ranked"""
+    return get_backend().search(queryset, query)
+
+
+def index_products(product_ids):
+    get_backend().index(product_ids)
+
+
+def index_category(category_id):
+    get_backend().index_category(category_id)
+
+
+def remove_products(product_ids):
+    get_backend().remove(product_ids)
+
+
+def rebuild_index():
+    return get_backend().rebuild()
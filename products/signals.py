@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Category, Product, ProductImage, ProductReview
+from .fragment_cache import FEATURED_PRODUCTS_FRAGMENT, ROOT_CATEGORIES_FRAGMENT
+from . import category_tree, fragment_cache, page_cache, search
+
+
+def invalidate_fragment(name):
+    transaction.on_commit(lambda: fragment_cache.invalidate(name))
+
+
+def is_featured(product_id=None, category_id=None):
+    """Whether the cached featured products block shows this product or category"""
+    entry = fragment_cache.peek(FEATURED_PRODUCTS_FRAGMENT)
+    if entry is None:
+        return False
+    return product_id in entry['product_ids'] or category_id in entry['category_ids']
+
+
+def invalidate_product_page(product_id):
+    slug = Product.objects.filter(pk=product_id).values_list('slug', flat=True).first()
+    if slug:
+        transaction.on_commit(lambda: page_cache.invalidate(slug))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """Keep the search index in sync with product edits"""
+    if not raw:
+        search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created=False, raw=False, **kwargs):
+    """Category names are indexed with their products, so renames must be re-indexed"""
+    if not raw and not created:
+        search.index_category(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    transaction.on_commit(category_tree.invalidate)
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_review_rating(sender, instance, **kwargs):
+    """Runs for queryset and cascade deletes too, which never call ProductReview.delete()"""
+    loaded = getattr(instance, '_loaded', (instance.product_id, instance.rating))
+    Product.apply_rating_change(loaded[0], -loaded[1], -1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_page_for_product(sender, instance, **kwargs):
+    transaction.on_commit(lambda: page_cache.invalidate(instance.slug))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_page_for_image(sender, instance, **kwargs):
+    # Images have no timestamp of their own, so the product's Last-Modified moves instead
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+    invalidate_product_page(instance.product_id)
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_page_for_review(sender, instance, **kwargs):
+    invalidate_product_page(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_home_for_product(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        availability_changed = instance.is_available
+    else:
+        availability_changed = getattr(instance, '_loaded_is_available', None) != instance.is_available
+    if availability_changed or is_featured(product_id=instance.pk):
+        invalidate_fragment(FEATURED_PRODUCTS_FRAGMENT)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_home_for_card(sender, instance, **kwargs):
+    product_id = instance.pk if sender is Product else instance.product_id
+    if is_featured(product_id=product_id):
+        invalidate_fragment(FEATURED_PRODUCTS_FRAGMENT)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_home_for_category(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # post_save runs before Category.save() rewrites the path, so path is still the old one
+    was_root = instance.path.count('/') == 1
+    if was_root or instance.parent_id is None:
+        invalidate_fragment(ROOT_CATEGORIES_FRAGMENT)
+    if is_featured(category_id=instance.pk):
+        invalidate_fragment(FEATURED_PRODUCTS_FRAGMENT)
@@ -0,0 +1,51 @@
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from django.utils.text import slugify
+from .models import Product
+
+# Keeps each OR'd LIKE group well under SQLite's expression depth limit
+LOOKUP_GROUP_SIZE = 200
+
+
+def _taken_slugs(bases):
+    """Existing slugs equal to, or suffixed from, any of the given bases"""
+    bases = list(bases)
+    taken = set()
+    for start in range(0, len(bases), LOOKUP_GROUP_SIZE):
+        group = bases[start:start + LOOKUP_GROUP_SIZE]
+        condition = reduce(or_, (Q(slug=base) | Q(slug__startswith=f'{base}-') for base in group))
+        taken.update(Product.objects.filter(condition).values_list('slug', flat=True))
+    return taken
+
+
+def unique_slugs(names, reserved=None):
+    """
+    Allocate one unique product slug per name with a single lookup per group of
+    names, instead of probing the table once per collision.
+
+    reserved collects slugs already handed out, so repeated calls (one per
+    import chunk) never return the same slug twice.
+    """
+    reserved = set() if reserved is None else reserved
+    bases = [slugify(name)[:40] or 'product' for name in names]
+    taken = _taken_slugs(set(bases)) | reserved
+
+    # Highest numeric suffix in use per base
+    counters = dict.fromkeys(bases, 0)
+    for slug in taken:
+        base, _, number = slug.rpartition('-')
+        if number.isdigit() and base in counters:
+            counters[base] = max(counters[base], int(number))
+
+    slugs = []
+    for base in bases:
+        slug = base
+        # Names in the same batch can produce a suffixed slug, so keep counting past those
+        while slug in taken:
+            counters[base] += 1
+            slug = f'{base}-{counters[base]}'
+        taken.add(slug)
+        reserved.add(slug)
+        slugs.append(slug)
+    return slugs
@@ -0,0 +1,40 @@
+import os
+from io import BytesIO
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+from django.core.files.base import ContentFile
+from taskqueue.registry import task
+from .models import ProductImage
+
+# Uploaded photos larger than this are scaled down to fit
+MAX_IMAGE_SIZE = (1600, 1600)
+
+
+@task
+def process_product_images(image_ids):
+    """
+    Turn uploaded product photos upright by their EXIF orientation and scale
+    down oversized ones. Queued by add_product; photos that need neither, or
+    are not images Pillow can read, are left alone.
+    """
+    for product_image in ProductImage.objects.filter(pk__in=image_ids):
+        try:
+            with product_image.image.open('rb') as file, Image.open(file) as original:
+                original.load()
+        except (FileNotFoundError, UnidentifiedImageError):
+            continue
+        rotated = original.getexif().get(ExifTags.Base.Orientation, 1) != 1
+        oversized = original.width > MAX_IMAGE_SIZE[0] or original.height > MAX_IMAGE_SIZE[1]
+        if not (rotated or oversized):
+            continue
+
+        processed = ImageOps.exif_transpose(original)
+        processed.thumbnail(MAX_IMAGE_SIZE)
+        buffer = BytesIO()
+        processed.save(buffer, format=original.format)
+
+        # The processed copy is saved under a new name and the original only
+        # deleted once the row points at it, so a failure never loses the photo
+        original_name = product_image.image.name
+        product_image.image.save(os.path.basename(original_name), ContentFile(buffer.getvalue()), save=False)
+        product_image.save(update_fields=['image'])
+        product_image.image.storage.delete(original_name)
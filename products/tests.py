@@ -1,3 +1,507 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import Mock, patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
 from django.test import TestCase
+from django.urls import reverse
+from users.models import CustomUser
+from .fragment_cache import FEATURED_PRODUCTS_FRAGMENT
+from .importer import ProductImporter, read_rows
+from .models import Category, Product, ProductImage, ProductReview
+from .pagination import CursorPaginator
+from .slugs import unique_slugs
+from . import fragment_cache, search, views
 
-# Create your tests here.
+
+def create_product(seller, category, slug, price, discount_price=None, **fields):
+    return Product.objects.create(
+        seller=seller, category=category, name=fields.pop('name', slug), slug=slug,
+        description=fields.pop('description', ''), price=price, discount_price=discount_price,
+        stock=fields.pop('stock', 100), **fields,
+    )
+
+
+def get_context(client, url, params=None):
+    """The context a products view renders with, without needing its template"""
+    with patch('products.views.render', side_effect=lambda request, template, context: HttpResponse()) as render:
+        client.get(url, params or {})
+    return render.call_args.args[2]
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.computers = Category.objects.create(name='Computers', slug='computers')
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.laptop = create_product(
+            self.seller, self.computers, 'laptop', Decimal('900.00'), name='Travel Laptop', description='Light and fast',
+        )
+        self.guide = create_product(
+            self.seller, self.books, 'guide', Decimal('20.00'), name='Buying guide',
+            description='How to choose a laptop',
+        )
+        self.hidden = create_product(
+            self.seller, self.computers, 'hidden', Decimal('500.00'), name='Old laptop', is_available=False,
+        )
+
+    def search(self, query):
+        return list(search.search(Product.objects.all(), query).values_list('slug', flat=True))
+
+    def search_page(self, **params):
+        context = get_context(self.client, reverse('products:search_products'), params)
+        return [product.slug for product in context['products']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search_page(q='laptop'), ['laptop', 'guide'])
+
+    def test_partial_words_match_while_typing(self):
+        self.assertEqual(set(self.search('lapt')), {'laptop', 'guide', 'hidden'})
+        self.assertEqual(self.search('trav lapt'), ['laptop'])
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.search('"laptop" OR NEAR(* -'), self.search('laptop or near'))
+        self.assertEqual(self.search('***'), [])
+
+    def test_price_filters_and_sorting(self):
+        self.assertEqual(self.search_page(q='laptop', max_price='100'), ['guide'])
+        self.assertEqual(self.search_page(q='laptop', sort='-price'), ['laptop', 'guide'])
+
+    def test_index_follows_product_edits_and_deletes(self):
+        self.laptop.name = 'Notebook computer'
+        self.laptop.save()
+        self.assertEqual(self.search('notebook'), ['laptop'])
+        self.assertEqual(self.search('travel'), [])
+
+        self.guide.delete()
+        self.assertEqual(set(self.search('laptop')), {'hidden'})
+
+    def test_category_rename_reindexes_its_products(self):
+        self.assertEqual(self.search('handbooks'), [])
+        self.books.name = 'Handbooks'
+        self.books.save()
+        self.assertEqual(self.search('handbooks'), ['guide'])
+
+    def test_rebuild_command_restores_the_index(self):
+        search.remove_products(Product.objects.values_list('pk', flat=True))
+        self.assertEqual(self.search('laptop'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(set(self.search('laptop')), {'laptop', 'guide', 'hidden'})
+
+    def test_fallback_backend_matches_substrings(self):
+        backend = search.FallbackSearchBackend(connection)
+        self.assertEqual(set(backend.search(Product.objects.all(), 'book').values_list('slug', flat=True)), {'guide'})
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        category = Category.objects.create(name='Books', slug='books')
+        # Ties on price are broken by id
+        for i, price in enumerate(['5.00', '5.00', '5.00', '10.00', '10.00', '20.00', '20.00']):
+            create_product(seller, category, f'book-{i}', Decimal(price))
+
+    def walk(self, ordering):
+        paginator = CursorPaginator(Product.objects.all(), 3, ordering=ordering)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def ids(self, page):
+        return [product.pk for product in page]
+
+    def test_forward_pages_cover_every_row_once(self):
+        for ordering, expected in [
+            ('effective_price', Product.objects.order_by('effective_price', 'pk')),
+            ('-effective_price', Product.objects.order_by('-effective_price', '-pk')),
+            ('-created_at', Product.objects.order_by('-created_at', '-pk')),
+        ]:
+            with self.subTest(ordering=ordering):
+                paginator, pages = self.walk(ordering)
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                self.assertEqual(sum(map(self.ids, pages), []), [product.pk for product in expected])
+                self.assertEqual([page.has_previous() for page in pages], [False, True, True])
+
+    def test_previous_cursors_return_the_same_pages(self):
+        paginator, pages = self.walk('effective_price')
+        previous = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(self.ids(previous), self.ids(pages[1]))
+        first = paginator.page(previous.previous_cursor)
+        self.assertEqual(self.ids(first), self.ids(pages[0]))
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+    def test_invalid_cursors_give_the_first_page(self):
+        paginator, pages = self.walk('effective_price')
+        for cursor in ['garbage', 'WyJ1cCIsMSwxXQ', 'WyJuZXh0Iiwibm90LWEtcHJpY2UiLDFd', '!!']:
+            with self.subTest(cursor=cursor):
+                page = paginator.page(cursor)
+                self.assertEqual(self.ids(page), self.ids(pages[0]))
+                self.assertFalse(page.has_previous())
+
+    def test_count_stops_at_the_limit(self):
+        self.assertEqual(CursorPaginator(Product.objects.all(), 3).count, 7)
+        capped = CursorPaginator(Product.objects.all(), 3, count_limit=4)
+        self.assertEqual((capped.count, capped.count_is_estimate), (5, True))
+        exact = CursorPaginator(Product.objects.all(), 3, count_limit=10)
+        self.assertEqual((exact.count, exact.count_is_estimate), (7, False))
+
+
+class RatingAggregateTest(TestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.buyers = [CustomUser.objects.create_user(username=f'buyer-{i}', password='secret') for i in range(3)]
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = create_product(seller, category, 'atlas', Decimal('20.00'))
+        self.other = create_product(seller, category, 'globe', Decimal('20.00'))
+
+    def assertAggregates(self, product, rating_sum, review_count, average_rating):
+        product.refresh_from_db()
+        self.assertEqual(
+            (product.rating_sum, product.review_count, product.average_rating),
+            (rating_sum, review_count, Decimal(average_rating)),
+        )
+
+    def review(self, buyer, rating):
+        self.client.force_login(buyer)
+        self.client.post(reverse('products:product_detail', args=['atlas']), {'rating': rating, 'comment': 'Read it'})
+
+    def test_reviews_created_edited_and_deleted(self):
+        self.review(self.buyers[0], 4)
+        self.assertAggregates(self.product, 4, 1, '4.00')
+        self.review(self.buyers[1], 5)
+        self.review(self.buyers[2], 5)
+        self.assertAggregates(self.product, 14, 3, '4.67')
+
+        # Posting again edits the existing review in place
+        self.review(self.buyers[0], 2)
+        self.assertEqual(self.product.reviews.count(), 3)
+        self.assertAggregates(self.product, 12, 3, '4.00')
+
+        ProductReview.objects.filter(user__in=self.buyers[1:]).delete()
+        self.assertAggregates(self.product, 2, 1, '2.00')
+        ProductReview.objects.all().delete()
+        self.assertAggregates(self.product, 0, 0, '0')
+
+    def test_saving_a_review_loaded_without_its_rating(self):
+        ProductReview.objects.create(product=self.product, user=self.buyers[0], rating=3, comment='Fine')
+        review = ProductReview.objects.only('comment').get()
+        review.rating = 5
+        review.save()
+        self.assertAggregates(self.product, 5, 1, '5.00')
+
+        review.product = self.other
+        review.save()
+        self.assertAggregates(self.product, 0, 0, '0')
+        self.assertAggregates(self.other, 5, 1, '5.00')
+
+    def test_recompute_ratings_repairs_drift(self):
+        for buyer, rating in zip(self.buyers, (3, 4, 4)):
+            ProductReview.objects.create(product=self.product, user=buyer, rating=rating, comment='Fine')
+        Product.objects.update(rating_sum=99, review_count=7, average_rating=Decimal('1.50'))
+        call_command('recompute_ratings', batch_size=1, stdout=io.StringIO())
+        self.assertAggregates(self.product, 11, 3, '3.67')
+        self.assertAggregates(self.other, 0, 0, '0')
+
+
+class ProductCardsTest(TestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        books = Category.objects.create(name='Books', slug='books')
+        maps = Category.objects.create(name='Maps', slug='maps')
+        self.products = [
+            create_product(seller, books if i % 2 else maps, f'book-{i}', Decimal('10.00')) for i in range(6)
+        ]
+        for product in self.products[1:]:
+            ProductImage.objects.create(product=product, image=f'product_images/{product.slug}-back.jpg')
+            ProductImage.objects.create(product=product, image=f'product_images/{product.slug}.jpg', is_primary=True)
+
+    def test_a_listing_is_one_query(self):
+        with self.assertNumQueries(1):
+            cards = [
+                (card.category_name, card.primary_image_url)
+                for card in Product.objects.cards().order_by('pk')
+            ]
+        self.assertEqual(cards[0], ('Maps', None))
+        self.assertEqual(cards[1], ('Books', '/media/product_images/book-1.jpg'))
+        self.assertEqual(len(cards), 6)
+
+
+class ProductPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.product = create_product(self.seller, category, 'atlas', Decimal('20.00'))
+        self.url = reverse('products:product_detail', args=['atlas'])
+        self.renders = 0
+        self.render_token = False
+        self.enterContext(patch('products.views.render', side_effect=self.render))
+
+    def render(self, request, template, context):
+        self.renders += 1
+        if self.render_token:
+            get_token(request)
+        product = context['product']
+        return HttpResponse(f'{product.name}: {len(context["reviews"])} reviews, {product.images.count()} images')
+
+    def test_repeat_visits_are_served_from_the_cache(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertEqual((self.renders, second.content), (1, first.content))
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self.renders, 1)
+
+        self.client.force_login(self.buyer)
+        self.client.get(self.url)
+        self.assertEqual(self.renders, 2)
+
+    def test_reviews_and_images_invalidate_the_page(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(product=self.product, user=self.buyer, rating=4, comment='Good')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, self.renders), (200, 2))
+        self.assertIn(b'1 reviews', response.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(product=self.product, image='product_images/atlas.jpg')
+        self.assertIn(b'1 images', self.client.get(self.url).content)
+        self.assertEqual(self.renders, 3)
+
+    def test_pages_with_a_rendered_token_are_not_stored(self):
+        self.render_token = True
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(self.renders, 2)
+
+    def test_csrf_cookie_is_issued_outside_the_cached_body(self):
+        response = self.client.get(self.url)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertIn('private', response['Cache-Control'])
+
+        # The client now sends the cookie back, so the cached copy can be shared
+        response = self.client.get(self.url)
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(self.renders, 1)
+
+
+class HomeFragmentTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.maps = Category.objects.create(name='Maps', slug='maps')
+        self.atlases = Category.objects.create(name='Atlases', slug='atlases', parent=self.maps)
+        # The oldest of FEATURED_COUNT + 1 available products is left off the home page
+        self.products = [create_product(seller, self.books, f'book-{i}', Decimal('10.00')) for i in range(9)]
+        self.unfeatured = self.products[0]
+        Product.objects.filter(pk=self.unfeatured.pk).update(created_at=self.unfeatured.created_at - timedelta(days=1))
+        self.featured = self.products[-1]
+        self.draft = create_product(seller, self.books, 'draft', Decimal('10.00'), is_available=False)
+        self.featured_builds = self.enterContext(
+            patch('products.views._build_featured_products', wraps=views._build_featured_products)
+        )
+        self.category_builds = self.enterContext(
+            patch('products.views._build_root_categories', wraps=views._build_root_categories)
+        )
+        self.enterContext(patch('products.views.render', side_effect=lambda request, template, context: HttpResponse()))
+        self.assertRebuilds(lambda: None, featured=1, categories=1)
+
+    def assertRebuilds(self, change, featured=0, categories=0):
+        """Run change, then load the home page and check which blocks it rebuilt"""
+        before = (self.featured_builds.call_count, self.category_builds.call_count)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.client.get(reverse('products:home'))
+        after = (self.featured_builds.call_count, self.category_builds.call_count)
+        self.assertEqual((after[0] - before[0], after[1] - before[1]), (featured, categories))
+
+    def save(self, instance, **fields):
+        for name, value in fields.items():
+            setattr(instance, name, value)
+        instance.save()
+
+    def test_availability_changes_rebuild_the_featured_block(self):
+        self.assertRebuilds(lambda: self.save(self.draft, is_available=True), featured=1)
+        self.assertRebuilds(lambda: self.save(self.draft, is_available=False), featured=1)
+
+    def test_featured_product_image_and_review_changes_rebuild_the_featured_block(self):
+        self.assertRebuilds(lambda: self.save(self.featured, name='New title'), featured=1)
+        self.assertRebuilds(
+            lambda: ProductImage.objects.create(product=self.featured, image='product_images/book.jpg'), featured=1,
+        )
+        self.assertRebuilds(
+            lambda: ProductReview.objects.create(product=self.featured, user=self.buyer, rating=5, comment='Good'),
+            featured=1,
+        )
+
+    def test_changes_off_the_home_page_rebuild_nothing(self):
+        self.assertRebuilds(lambda: self.save(self.unfeatured, name='New title', price=Decimal('12.00')))
+        self.assertRebuilds(lambda: ProductImage.objects.create(product=self.unfeatured, image='product_images/old.jpg'))
+        self.assertRebuilds(
+            lambda: ProductReview.objects.create(product=self.unfeatured, user=self.buyer, rating=3, comment='Fine'),
+        )
+        self.assertRebuilds(lambda: self.save(self.draft, name='Still a draft'))
+        self.assertRebuilds(lambda: self.save(self.atlases, name='World atlases'))
+
+    def test_root_category_changes_rebuild_the_category_block(self):
+        self.assertRebuilds(lambda: Category.objects.create(name='Globes', slug='globes'), categories=1)
+        self.assertRebuilds(lambda: self.save(self.maps, name='Charts'), categories=1)
+        # Moving a category into or out of the roots
+        self.assertRebuilds(lambda: self.save(self.atlases, parent=None), categories=1)
+        self.assertRebuilds(lambda: self.save(self.atlases, parent=self.maps), categories=1)
+        # Books holds the featured products, so both blocks show it
+        self.assertRebuilds(lambda: self.save(self.books, name='Novels'), featured=1, categories=1)
+
+    def test_stale_entry_is_served_while_another_request_rebuilds(self):
+        fragment_cache.invalidate(FEATURED_PRODUCTS_FRAGMENT)
+        cache.add(fragment_cache._lock_key(FEATURED_PRODUCTS_FRAGMENT), True, fragment_cache.LOCK_TIMEOUT)
+        build = Mock()
+        with patch('products.fragment_cache.time.sleep') as sleep:
+            entry = fragment_cache.get_fragment(FEATURED_PRODUCTS_FRAGMENT, build)
+        build.assert_not_called()
+        sleep.assert_not_called()
+        self.assertIn(self.featured.pk, entry['product_ids'])
+
+
+class EffectivePriceTest(TestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.sale = create_product(seller, self.books, 'sale', Decimal('20.00'), Decimal('8.00'), name='Sale book')
+        self.plain = create_product(seller, self.books, 'plain', Decimal('10.00'), name='Plain book')
+        self.pricey = create_product(seller, self.books, 'pricey', Decimal('30.00'), Decimal('25.00'), name='Pricey book')
+
+    def test_partial_saves_keep_it_in_step(self):
+        self.plain.discount_price = Decimal('7.50')
+        self.plain.save(update_fields=['discount_price'])
+        self.plain.refresh_from_db()
+        self.assertEqual(self.plain.effective_price, Decimal('7.50'))
+
+        self.plain.discount_price = None
+        self.plain.save(update_fields=['discount_price'])
+        self.plain.refresh_from_db()
+        self.assertEqual(self.plain.effective_price, Decimal('10.00'))
+
+        self.sale.price = Decimal('5.00')
+        self.sale.save(update_fields=['price'])
+        self.assertEqual(Product.objects.get(pk=self.sale.pk).effective_price, Decimal('8.00'))
+
+    def filtered(self, url, **params):
+        return {product.slug for product in get_context(self.client, url, params)['products']}
+
+    def test_price_filters_use_the_discounted_price(self):
+        listing = reverse('products:category_detail', args=['books'])
+        search_page = reverse('products:search_products')
+        for url, query in ((listing, {}), (search_page, {'q': 'book'})):
+            with self.subTest(url=url):
+                # The sale book lists at 20.00 but sells for 8.00
+                self.assertEqual(self.filtered(url, min_price='9', max_price='20', **query), {'plain'})
+                self.assertEqual(self.filtered(url, max_price='9', **query), {'sale'})
+                self.assertEqual(self.filtered(url, min_price='25', **query), {'pricey'})
+
+
+class CategoryTreeTest(TestCase):
+    def setUp(self):
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.fiction = Category.objects.create(name='Fiction', slug='fiction', parent=self.books)
+        self.crime = Category.objects.create(name='Crime', slug='crime', parent=self.fiction)
+        self.games = Category.objects.create(name='Games', slug='games')
+
+    def slugs(self, categories):
+        return sorted(category.slug for category in categories)
+
+    def test_descendants_cover_the_subtree_only(self):
+        self.assertEqual(self.slugs(self.books.get_descendants()), ['books', 'crime', 'fiction'])
+        self.assertEqual(self.slugs(self.fiction.get_descendants(include_self=False)), ['crime'])
+        self.assertEqual(self.slugs(self.games.get_descendants()), ['games'])
+        self.assertEqual(self.crime.get_ancestor_ids(), [self.books.pk, self.fiction.pk])
+
+    def test_sibling_ids_sharing_a_prefix_stay_apart(self):
+        # Padding keeps category 1's subtree from matching categories 10, 100, ...
+        Category.objects.filter(pk=self.games.pk).update(path=Category.PATH_SEGMENT_FORMAT.format(self.books.pk * 10))
+        self.assertEqual(self.slugs(self.books.get_descendants()), ['books', 'crime', 'fiction'])
+
+    def test_moving_a_category_moves_its_subtree(self):
+        self.fiction.parent = self.games
+        self.fiction.save()
+        self.assertEqual(self.slugs(self.games.get_descendants()), ['crime', 'fiction', 'games'])
+        self.assertEqual(self.slugs(self.books.get_descendants()), ['books'])
+        crime = Category.objects.get(pk=self.crime.pk)
+        self.assertEqual(crime.get_ancestor_ids(), [self.games.pk, self.fiction.pk])
+
+        self.fiction.parent = None
+        self.fiction.save()
+        self.assertEqual(Category.objects.get(pk=self.crime.pk).get_ancestor_ids(), [self.fiction.pk])
+
+    def test_cannot_move_under_own_subtree(self):
+        self.books.parent = self.crime
+        with self.assertRaises(ValueError):
+            self.books.save()
+
+
+class SlugAllocationTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.category = Category.objects.create(name='Shirts', slug='shirts')
+
+    def test_batch_never_repeats_a_slug(self):
+        self.assertEqual(unique_slugs(['Shirt 1', 'Shirt', 'Shirt']), ['shirt-1', 'shirt', 'shirt-2'])
+        self.assertEqual(unique_slugs(['Shirt', 'Shirt 2', 'Shirt', 'Shirt']), ['shirt', 'shirt-2', 'shirt-1', 'shirt-3'])
+
+    def test_existing_and_reserved_slugs_are_skipped(self):
+        create_product(self.seller, self.category, 'shirt', Decimal('5.00'))
+        create_product(self.seller, self.category, 'shirt-4', Decimal('5.00'))
+        reserved = set()
+        self.assertEqual(unique_slugs(['Shirt', 'Hat'], reserved), ['shirt-5', 'hat'])
+        self.assertEqual(unique_slugs(['Shirt', 'Hat'], reserved), ['shirt-6', 'hat-1'])
+        self.assertEqual(unique_slugs(['!!!']), ['product'])
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.category = Category.objects.create(name='Shirts', slug='shirts')
+
+    def run_import(self, text, format='csv', chunk_size=1000):
+        importer = ProductImporter(self.seller, chunk_size=chunk_size)
+        return importer.run(read_rows(io.BytesIO(text.encode()), format))
+
+    def test_colliding_names_in_one_chunk_are_all_created(self):
+        result = self.run_import(
+            'category,name,description,price\n'
+            'shirts,Shirt 1,A,5.00\n'
+            'shirts,Shirt,B,5.00\n'
+            'shirts,Shirt,C,5.00\n'
+            f'{self.category.pk},Shirt,D,5.00\n'
+        )
+        self.assertEqual((result.created, result.failed), (4, 0))
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)), ['shirt', 'shirt-1', 'shirt-2', 'shirt-3'],
+        )
+
+    def test_invalid_rows_are_reported_and_the_rest_created(self):
+        result = self.run_import(
+            '{"category": "shirts", "name": "Tee", "description": "x", "price": "9.50", "discount_price": "7.00"}\n'
+            '{"category": "hats", "name": "Cap", "description": "x", "price": "3.00"}\n'
+            'not json\n'
+            '{"category": "shirts", "name": "Polo", "description": "x", "price": "12.00", "is_available": false}\n',
+            format='jsonl', chunk_size=1,
+        )
+        self.assertEqual((result.created, result.failed), (2, 2))
+        self.assertEqual([line for line, errors in result.errors], [2, 3])
+        tee = Product.objects.get(name='Tee')
+        self.assertEqual((tee.effective_price, tee.is_available), (Decimal('7.00'), True))
+        self.assertFalse(Product.objects.get(name='Polo').is_available)
@@ -1,56 +1,87 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Q, Avg
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from .models import Product, Category, ProductReview
 from .forms import ProductReviewForm
+from .pagination import CursorPaginator
+from .fragment_cache import FEATURED_PRODUCTS_FRAGMENT, ROOT_CATEGORIES_FRAGMENT
+from . import category_tree, fragment_cache, page_cache, search
+
+PRODUCTS_PER_PAGE = 12
+FEATURED_COUNT = 8
+
+# Listings sort on these columns only; each is paired with the id for cursor pagination.
+# Price sorts use the stored effective price, i.e. what the customer actually pays.
+SORT_OPTIONS = {
+    '-created_at': '-created_at',
+    'created_at': 'created_at',
+    'price': 'effective_price',
+    '-price': '-effective_price',
+    'name': 'name',
+    '-name': '-name',
+}
+DEFAULT_SORT = '-created_at'
+
+# Listing counts stop being exact beyond this many rows
+COUNT_LIMIT = 1000
+
+def _build_featured_products():
+    featured_products = list(Product.objects.cards().filter(is_available=True).order_by('-created_at')[:FEATURED_COUNT])
+    return {
+        'html': render_to_string('products/includes/featured_products.html', {'featured_products': featured_products}),
+        # Kept so signals can tell whether a change touches what is on the page
+        'product_ids': {product.id for product in featured_products},
+        'category_ids': {product.category_id for product in featured_products},
+    }
+
+def _build_root_categories():
+    categories = Category.objects.filter(parent=None)
+    return {
+        'html': render_to_string('products/includes/category_cards.html', {'categories': categories}),
+    }
 
 def home(request):
     """Home page view with featured products and categories"""
-    featured_products = Product.objects.filter(is_available=True).order_by('-created_at')[:8]
-    categories = Category.objects.filter(parent=None)
+    # Both blocks are cached as rendered fragments and rebuilt only when their contents change
+    featured_products = fragment_cache.get_fragment(FEATURED_PRODUCTS_FRAGMENT, _build_featured_products)
+    categories = fragment_cache.get_fragment(ROOT_CATEGORIES_FRAGMENT, _build_root_categories)
     
     context = {
-        'featured_products': featured_products,
-        'categories': categories,
+        'featured_products_html': mark_safe(featured_products['html']),
+        'categories_html': mark_safe(categories['html']),
     }
     return render(request, 'products/home.html', context)
 
 def category_detail(request, category_slug):
     """View to display products from a specific category"""
     category = get_object_or_404(Category, slug=category_slug)
+    tree = category_tree.get_tree()
     
-    # Get all products from this category and its subcategories
-    categories = [category]
-    if category.children.exists():
-        categories.extend(category.children.all())
-    
-    products_list = Product.objects.filter(category__in=categories, is_available=True)
+    # Get all products from this category and its subcategories at any depth
+    products_list = Product.objects.cards().filter(category__in=category.get_descendants(), is_available=True)
     
     # Apply filters
-    sort_by = request.GET.get('sort', '-created_at')
+    sort_by = request.GET.get('sort', DEFAULT_SORT)
+    if sort_by not in SORT_OPTIONS:
+        sort_by = DEFAULT_SORT
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
     
     if min_price:
-        products_list = products_list.filter(price__gte=min_price)
+        products_list = products_list.filter(effective_price__gte=min_price)
     if max_price:
-        products_list = products_list.filter(price__lte=max_price)
+        products_list = products_list.filter(effective_price__lte=max_price)
     
-    products_list = products_list.order_by(sort_by)
-    
-    # Pagination
-    paginator = Paginator(products_list, 12)
-    page = request.GET.get('page')
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+    # Cursor pagination
+    paginator = CursorPaginator(products_list, PRODUCTS_PER_PAGE, ordering=SORT_OPTIONS[sort_by], count_limit=COUNT_LIMIT)
+    products = paginator.page(request.GET.get('cursor'))
     
     context = {
         'category': category,
+        'breadcrumbs': tree.breadcrumbs(category),
+        'subcategories': tree.children(category),
         'products': products,
         'sort_by': sort_by,
         'min_price': min_price,
@@ -60,9 +91,17 @@ def category_detail(request, category_slug):
 
 def product_detail(request, product_slug):
     """View to display product details and handle review submission"""
+    # Anonymous visitors share one cached rendering per product
+    cacheable = page_cache.is_cacheable(request)
+    if cacheable:
+        version = page_cache.get_version(product_slug)
+        response = page_cache.get_response(request, product_slug, version)
+        if response is not None:
+            return response
+    
     product = get_object_or_404(Product, slug=product_slug, is_available=True)
     reviews = product.reviews.all().order_by('-created_at')
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+    avg_rating = product.average_rating
     
     # Handle review form submission
     if request.method == 'POST':
@@ -92,8 +131,8 @@ def product_detail(request, product_slug):
         form = ProductReviewForm()
     
     # Related products from same category
-    related_products = Product.objects.filter(
-        category=product.category, is_available=True
+    related_products = Product.objects.cards().filter(
+        category=product.category_id, is_available=True
     ).exclude(id=product.id)[:4]
     
     context = {
@@ -103,41 +142,49 @@ def product_detail(request, product_slug):
         'review_form': form,
         'related_products': related_products,
     }
-    return render(request, 'products/product_detail.html', context)
+    response = render(request, 'products/product_detail.html', context)
+    if cacheable:
+        response = page_cache.store_response(request, product_slug, version, response, product.updated_at)
+    return response
 
 def search_products(request):
     """Search for products"""
     query = request.GET.get('q', '')
     
-    products_list = Product.objects.filter(is_available=True)
+    products_list = Product.objects.cards().filter(is_available=True)
+    ranked = False
     if query:
-        products_list = products_list.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(category__name__icontains=query)
-        ).distinct()
+        backend = search.get_backend()
+        products_list = backend.search(products_list, query)
+        ranked = backend.ranked
     
     # Apply filters
-    sort_by = request.GET.get('sort', '-created_at')
+    sort_by = request.GET.get('sort', 'relevance' if ranked else DEFAULT_SORT)
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
     
     if min_price:
-        products_list = products_list.filter(price__gte=min_price)
+        products_list = products_list.filter(effective_price__gte=min_price)
     if max_price:
-        products_list = products_list.filter(price__lte=max_price)
-    
-    products_list = products_list.order_by(sort_by)
-    
-    # Pagination
-    paginator = Paginator(products_list, 12)
-    page = request.GET.get('page')
-    try:
-        products = paginator.page(page)
-    except PageNotAnInteger:
-        products = paginator.page(1)
-    except EmptyPage:
-        products = paginator.page(paginator.num_pages)
+        products_list = products_list.filter(effective_price__lte=max_price)
+    
+    if sort_by == 'relevance' and ranked:
+        # Relevance is computed by the search index, so it can't be used as a
+        # cursor; ranked results keep page-number pagination
+        products_list = products_list.order_by('-search_rank', '-created_at')
+        paginator = Paginator(products_list, PRODUCTS_PER_PAGE)
+        page = request.GET.get('page')
+        try:
+            products = paginator.page(page)
+        except PageNotAnInteger:
+            products = paginator.page(1)
+        except EmptyPage:
+            products = paginator.page(paginator.num_pages)
+    else:
+        if sort_by not in SORT_OPTIONS:
+            sort_by = DEFAULT_SORT
+        paginator = CursorPaginator(products_list, PRODUCTS_PER_PAGE, ordering=SORT_OPTIONS[sort_by], count_limit=COUNT_LIMIT)
+        products = paginator.page(request.GET.get('cursor'))
     
     context = {
         'products': products,
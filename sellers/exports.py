@@ -0,0 +1,99 @@
+import csv
+import datetime
+import json
+from django.utils import timezone
+from orders.models import OrderItem
+from .models import SellerDailySales
+
+KINDS = ('orders', 'sales')
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Rows fetched from the database per round-trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_COLUMNS = (
+    ('order_id', 'order_id'),
+    ('order_date', 'order__created_at'),
+    ('status', 'order__status'),
+    ('payment_status', 'order__payment_status'),
+    ('product_id', 'product_id'),
+    ('product_name', 'product__name'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'price'),
+)
+
+SALES_COLUMNS = (
+    ('day', 'day'),
+    ('product_id', 'product_id'),
+    ('product_name', 'product__name'),
+    ('units', 'units'),
+    ('revenue', 'revenue'),
+    ('orders', 'orders'),
+)
+
+
+def _start_of(day):
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=timezone.get_current_timezone())
+
+
+def order_lines(seller, start=None, end=None):
+    """The seller's order lines, oldest first, optionally limited to orders placed from start to end (dates)"""
+    lines = OrderItem.objects.filter(product__seller=seller)
+    # Plain datetime bounds rather than a __date lookup, so the filter can use an index
+    if start:
+        lines = lines.filter(order__created_at__gte=_start_of(start))
+    if end:
+        lines = lines.filter(order__created_at__lt=_start_of(end + datetime.timedelta(days=1)))
+    return lines.order_by('order_id', 'pk').values_list(*[field for _, field in ORDER_COLUMNS])
+
+
+def sales(seller, start=None, end=None):
+    """The seller's daily sales rollup rows, by day and product"""
+    rows = SellerDailySales.objects.filter(seller=seller)
+    if start:
+        rows = rows.filter(day__gte=start)
+    if end:
+        rows = rows.filter(day__lte=end)
+    return rows.order_by('day', 'product_id').values_list(*[field for _, field in SALES_COLUMNS])
+
+
+def export_rows(kind, seller, start=None, end=None):
+    """(header, row iterator) for an export; rows are streamed from the database in chunks"""
+    if kind == 'orders':
+        rows = order_lines(seller, start, end).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        # Line totals are multiplied here so they keep the price's two decimal places
+        rows = (row + (row[-2] * row[-1],) for row in rows)
+        return [name for name, _ in ORDER_COLUMNS] + ['line_total'], rows
+    rows = sales(seller, start, end).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return [name for name, _ in SALES_COLUMNS], rows
+
+
+class _Echo:
+    """File-like object whose write() hands the text back, so csv.writer can format one row at a time"""
+
+    def write(self, value):
+        return value
+
+
+def encode(header, rows, format):
+    """
+    Yield the export as encoded lines. Only one row is held at a time, so
+    memory use does not depend on how many rows there are.
+    """
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header).encode()
+        for row in rows:
+            yield writer.writerow(row).encode()
+    else:
+        for row in rows:
+            yield (json.dumps(dict(zip(header, row)), default=str) + '\n').encode()
+
+
+def filename(kind, format, start=None, end=None):
+    parts = [kind] + [str(day) for day in (start, end) if day]
+    return f'{"_".join(parts)}.{format}'
@@ -1,4 +1,6 @@
 from django import forms
+from products.importer import FORMATS
+from . import exports
 from .models import SellerProfile
 
 class SellerProfileForm(forms.ModelForm):
@@ -18,4 +20,76 @@ class SellerProfileForm(forms.ModelForm):
         help_texts = {
             'description': 'Tell customers about your business, products, and services',
             'logo': 'Upload a logo or brand image for your store',
-        }
\ No newline at end of file
+        }
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        label='Catalog File',
+        help_text='CSV with a header row, or one JSON object per line. Columns: category (slug or id), '
+                  'name, description, price, discount_price, stock, is_available',
+    )
+    format = forms.ChoiceField(
+        choices=[('', 'Detect from file extension')] + [(format, format.upper()) for format in FORMATS],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('format'):
+            extension = upload.name.rsplit('.', 1)[-1].lower()
+            if extension not in FORMATS:
+                raise forms.ValidationError('Could not detect the file format; please choose one.')
+            cleaned_data['format'] = extension
+        return cleaned_data
+
+class SellerExportForm(forms.Form):
+    format = forms.ChoiceField(choices=[(format, format.upper()) for format in exports.FORMATS], initial='csv', required=False)
+    start = forms.DateField(required=False, help_text='First day to include (YYYY-MM-DD)')
+    end = forms.DateField(required=False, help_text='Last day to include (YYYY-MM-DD)')
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError('The start date must not be after the end date.')
+        return cleaned_data
+
+class ProductIdsField(forms.Field):
+    """Any number of product ids posted under the same name, e.g. from list checkboxes"""
+    widget = forms.MultipleHiddenInput
+    
+    def to_python(self, value):
+        try:
+            return [int(product_id) for product_id in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Invalid product selection.')
+
+class ProductBulkActionForm(forms.Form):
+    ACTION_CHOICES = (
+        ('make_available', 'Mark as available'),
+        ('make_unavailable', 'Mark as unavailable'),
+        ('adjust_price', 'Adjust prices by a percentage'),
+        ('delete', 'Delete'),
+    )
+    
+    action = forms.ChoiceField(choices=ACTION_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    product_ids = ProductIdsField(required=False)
+    apply_to_all = forms.BooleanField(
+        required=False,
+        help_text='Apply to every product matching the current filters, not just the selected ones',
+    )
+    percent = forms.DecimalField(
+        max_digits=5, decimal_places=2, min_value=-99, max_value=1000, required=False,
+        help_text='e.g. 10 raises prices by 10%, -15 lowers them by 15%',
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('apply_to_all') and not cleaned_data.get('product_ids'):
+            raise forms.ValidationError('Select at least one product.')
+        if cleaned_data.get('action') == 'adjust_price' and not cleaned_data.get('percent'):
+            raise forms.ValidationError('Enter the percentage to adjust prices by.')
+        return cleaned_data
\ No newline at end of file
@@ -0,0 +1,38 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from sellers import exports
+from users.models import CustomUser
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'"{value}" is not a YYYY-MM-DD date.')
+
+
+class Command(BaseCommand):
+    help = "Stream a seller's order lines or daily sales as CSV or JSONL, in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=exports.KINDS)
+        parser.add_argument('--seller', required=True, help='Username of the seller to export')
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--start', type=_date, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--end', type=_date, help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--output', help='File to write; defaults to standard output')
+
+    def handle(self, *args, **options):
+        try:
+            seller = CustomUser.objects.get(username=options['seller'], user_type='seller')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'No seller with username "{options["seller"]}".')
+
+        header, rows = exports.export_rows(options['kind'], seller, options['start'], options['end'])
+        chunks = exports.encode(header, rows, options['format'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from orders.models import Order
+from sellers.models import SellerDailySales
+from sellers.rollups import record_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild SellerDailySales from paid order history, in order id-range chunks. '
+        'Orders paid while it runs may be counted twice, so run it with checkout paused '
+        'and no sales rollup tasks left in the queue.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders read per chunk')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        paid = Order.objects.filter(payment_status='completed')
+        bounds = paid.aggregate(low=Min('pk'), high=Max('pk'))
+        SellerDailySales.objects.all().delete()
+        if bounds['low'] is None:
+            self.stdout.write('No paid orders to roll up.')
+            return
+
+        orders = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            order_ids = list(paid.filter(pk__gte=start, pk__lt=start + batch_size).values_list('pk', flat=True))
+            if order_ids:
+                record_orders(order_ids)
+                orders += len(order_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {orders} paid orders.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import FORMATS, InvalidImportFile, read_rows
+from sellers.sync import DEFAULT_CHUNK_SIZE, InventorySync
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Apply stock and price rows from a CSV or JSONL file to a seller's products, writing only what changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or JSONL file; columns: id or slug, stock, price, '
+                                         'discount_price, is_available')
+        parser.add_argument('--seller', required=True, help='Username of the seller who owns the products')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows diffed and written together')
+
+    def handle(self, *args, **options):
+        try:
+            seller = CustomUser.objects.get(username=options['seller'], user_type='seller')
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'No seller with username "{options["seller"]}".')
+
+        format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        sync = InventorySync(seller, chunk_size=options['chunk_size'])
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = sync.run(read_rows(stream, format))
+        except (OSError, InvalidImportFile) as e:
+            raise CommandError(str(e))
+
+        for line, errors in result.errors:
+            for field, messages in errors.items():
+                self.stderr.write(f'Line {line}: {field}: {" ".join(messages)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.changed} products changed, {result.unchanged} unchanged, {result.rejected} rows rejected.'
+        ))
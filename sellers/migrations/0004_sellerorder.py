@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+
+
+def backfill_seller_orders(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    SellerOrder = apps.get_model('sellers', 'SellerOrder')
+    shares = OrderItem.objects.values('order', 'product__seller', 'order__created_at').annotate(
+        subtotal=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    ).order_by('order', 'product__seller')
+    batch = []
+    for share in shares.iterator(chunk_size=1000):
+        batch.append(SellerOrder(
+            seller_id=share['product__seller'], order_id=share['order'],
+            created_at=share['order__created_at'], subtotal=share['subtotal'],
+        ))
+        if len(batch) == 1000:
+            SellerOrder.objects.bulk_create(batch)
+            batch = []
+    SellerOrder.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_history_summary'),
+        ('sellers', '0003_sellerdailysales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_orders', to='orders.order')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['seller', 'created_at'], name='seller_order_history_idx')],
+                'unique_together': {('seller', 'order')},
+            },
+        ),
+        migrations.RunPython(backfill_seller_orders, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from users.models import CustomUser
+from products.models import Product
 
 class SellerProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='seller_profile')
@@ -11,4 +12,47 @@ class SellerProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return self.company_name
\ No newline at end of file
+        return self.company_name
+
+class SellerDailySales(models.Model):
+    """
+    Paid sales per seller, product and order day, kept up to date as orders
+    are paid or refunded (see sellers.rollups) so seller pages never scan
+    OrderItem.
+    """
+    seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Each paid order counts once per seller, on the row of its lowest product
+    # id, so summing this over a seller's rows gives their number of orders
+    orders = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('seller', 'day', 'product')
+        verbose_name_plural = 'seller daily sales'
+    
+    def __str__(self):
+        return f"{self.product_id} on {self.day} for {self.seller_id}"
+
+class SellerOrder(models.Model):
+    """
+    One row per seller in each order, written at checkout with the seller's
+    share of it, so a seller's order list pages through its own
+    (seller, created_at) index instead of probing every order.
+    """
+    seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='seller_orders')
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='seller_orders')
+    # Copied from the order, to order the index by
+    created_at = models.DateTimeField()
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    class Meta:
+        unique_together = ('seller', 'order')
+        indexes = [
+            models.Index(fields=['seller', 'created_at'], name='seller_order_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Order {self.order_id} for {self.seller_id}"
@@ -0,0 +1,96 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import connections, router, transaction
+from django.utils import timezone
+from orders.models import OrderItem
+from .models import SellerDailySales, SellerOrder
+
+# Rows per upsert statement; six parameters each stays under SQLite's variable limit
+UPSERT_BATCH_SIZE = 150
+
+
+def _accumulate(totals, day, lines, sign):
+    """Add one order's (product_id, seller_id, quantity, price) lines into totals keyed by (seller, day, product)"""
+    first_product = {}
+    for product_id, seller_id, quantity, price in lines:
+        row = totals[seller_id, day, product_id]
+        row[0] += sign * quantity
+        row[1] += sign * quantity * price
+        if product_id < first_product.get(seller_id, product_id + 1):
+            first_product[seller_id] = product_id
+    for seller_id, product_id in first_product.items():
+        totals[seller_id, day, product_id][2] += sign
+
+
+def _new_totals():
+    # [units, revenue, orders]
+    return defaultdict(lambda: [0, 0, 0])
+
+
+def _write(totals):
+    """Add totals onto the rollup with INSERT ... ON CONFLICT DO UPDATE, a batch of rows per statement"""
+    connection = connections[router.db_for_write(SellerDailySales)]
+    qn = connection.ops.quote_name
+    table = qn(SellerDailySales._meta.db_table)
+    columns = ('seller_id', 'day', 'product_id', 'units', 'revenue', 'orders')
+    rows = [(*key, *values) for key, values in totals.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(qn(column) for column in columns)}) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({qn("seller_id")}, {qn("day")}, {qn("product_id")}) DO UPDATE SET '
+                + ', '.join(f'{qn(column)} = {table}.{qn(column)} + EXCLUDED.{qn(column)}' for column in columns[3:]),
+                [connection.ops.adapt_datefield_value(value) if index == 1 else value
+                 for row in batch for index, value in enumerate(row)],
+            )
+
+
+def _order_lines(order_ids):
+    return OrderItem.objects.filter(order__in=order_ids).values_list(
+        'order_id', 'order__created_at', 'product_id', 'product__seller_id', 'quantity', 'price',
+    ).order_by('order_id')
+
+
+def record_order(order, sign=1):
+    """
+    Add a newly paid order to the rollup, or take a refunded one back out
+    with sign=-1. Sales are filed under the day the order was placed, so a
+    refund always lands on the row its sale went to.
+    """
+    totals = _new_totals()
+    day = timezone.localdate(order.created_at)
+    lines = [line[2:] for line in _order_lines([order.pk])]
+    _accumulate(totals, day, lines, sign)
+    with transaction.atomic():
+        _write(totals)
+
+
+def record_orders(order_ids):
+    """Add many paid orders to the rollup with one read and a few upserts; used by the backfill"""
+    totals = _new_totals()
+    by_order = defaultdict(list)
+    placed = {}
+    for order_id, created_at, *line in _order_lines(order_ids):
+        by_order[order_id].append(line)
+        placed[order_id] = created_at
+    for order_id, lines in by_order.items():
+        _accumulate(totals, timezone.localdate(placed[order_id]), lines, 1)
+    with transaction.atomic():
+        _write(totals)
+
+
+def record_seller_orders(order, lines):
+    """
+    File a new order under each seller with a line in it, from its
+    (seller_id, quantity, price) lines, in one INSERT; checkout calls this
+    in the transaction that creates the order.
+    """
+    subtotals = defaultdict(Decimal)
+    for seller_id, quantity, price in lines:
+        subtotals[seller_id] += quantity * price
+    SellerOrder.objects.bulk_create([
+        SellerOrder(seller_id=seller_id, order=order, created_at=order.created_at, subtotal=subtotal)
+        for seller_id, subtotal in subtotals.items()
+    ])
@@ -0,0 +1,77 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from products.models import Product
+from .models import SellerProfile
+
+# Profile and product edits retire the entry; checkouts taking the last unit of a
+# product do not, so the out-of-stock count can lag by up to this long
+CONTEXT_TIMEOUT = 60 * 5
+
+
+def _version_key(user_id):
+    return f'sellers:context_version:{user_id}'
+
+
+def _key(user_id, version):
+    return f'sellers:context:{user_id}:{version}'
+
+
+def _version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+class SellerContext:
+    """What seller pages show about the seller on every request, cheap to cache and pickle"""
+
+    def __init__(self, profile, product_stats):
+        # The SellerProfile itself, so templates get logo.url, created_at and user as usual
+        self.profile = profile
+        self.total_products = product_stats['total']
+        self.active_products = product_stats['active']
+        self.out_of_stock = product_stats['out_of_stock']
+
+    @classmethod
+    def load(cls, user):
+        # By user_id, so the cached profile does not carry a copy of the user
+        profile, created = SellerProfile.objects.get_or_create(
+            user_id=user.pk,
+            defaults={'company_name': user.username + "'s Store"}
+        )
+        # Product counts in one pass over the seller's products
+        product_stats = Product.objects.filter(seller=user).aggregate(
+            total=Count('pk'),
+            active=Count('pk', filter=Q(is_available=True)),
+            out_of_stock=Count('pk', filter=Q(stock=0)),
+        )
+        return cls(profile, product_stats)
+
+
+def get_seller_context(user):
+    """
+    The user's SellerContext: remembered on the user for the request, and
+    cached across requests. The context is stored under the version read
+    before loading it, so a load racing with a change lands under a version
+    nobody asks for again.
+    """
+    context = getattr(user, '_seller_context', None)
+    if context is None:
+        key = _key(user.pk, _version(user.pk))
+        context = cache.get(key)
+        if context is None:
+            context = SellerContext.load(user)
+            cache.set(key, context, CONTEXT_TIMEOUT)
+        context.profile.user = user
+        user._seller_context = context
+    return context
+
+
+def invalidate(user_id):
+    """Call after changing the seller's profile or products; takes effect once the transaction commits"""
+    transaction.on_commit(lambda: cache.set(_version_key(user_id), time.time_ns(), None))
@@ -0,0 +1,40 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from orders.models import Order
+from products.models import Product
+from .models import SellerProfile
+from .tasks import record_order_sales
+from . import seller_context
+
+
+@receiver(post_save, sender=Order)
+def roll_up_payment(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Keep SellerDailySales in step with orders becoming paid, or refunded
+    after being paid. The rollup is updated by the task worker, off the
+    payment request.
+    """
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_payment_status', None)
+    if previous == instance.payment_status:
+        return
+    if instance.payment_status == 'completed':
+        record_order_sales.delay(instance.pk)
+    elif previous == 'completed':
+        record_order_sales.delay(instance.pk, -1)
+
+
+@receiver(post_save, sender=SellerProfile)
+@receiver(post_delete, sender=SellerProfile)
+def invalidate_context_for_profile(sender, instance, raw=False, **kwargs):
+    if not raw:
+        seller_context.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_context_for_product(sender, instance, raw=False, **kwargs):
+    """Product counts on seller pages; bulk paths call seller_context.invalidate themselves"""
+    if not raw:
+        seller_context.invalidate(instance.seller_id)
@@ -0,0 +1,178 @@
+from django import forms
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from cart import pricing
+from products.fragment_cache import FEATURED_PRODUCTS_FRAGMENT
+from products.models import Product
+from products import fragment_cache, page_cache
+from . import seller_context
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Only this many row errors are kept for the report; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+SYNC_FIELDS = ('stock', 'price', 'discount_price', 'is_available')
+
+
+class ProductSyncRowForm(forms.Form):
+    """
+    Validates one sync row. A column that is missing or left empty keeps the
+    product's current value, except discount_price, where an empty value
+    removes the discount.
+    """
+    id = forms.IntegerField(min_value=1, required=False)
+    slug = forms.SlugField(required=False)
+    stock = forms.IntegerField(min_value=0, required=False)
+    price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    discount_price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    is_available = forms.NullBooleanField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('id') and not cleaned_data.get('slug'):
+            raise forms.ValidationError('Each row needs a product id or slug.')
+        return cleaned_data
+
+    def changes(self):
+        """{field: new value} for the fields this row sets"""
+        changes = {}
+        for field in SYNC_FIELDS:
+            if field not in self.data:
+                continue
+            value = self.cleaned_data[field]
+            if value is None and field != 'discount_price':
+                continue
+            changes[field] = value
+        return changes
+
+
+class SyncResult:
+    def __init__(self):
+        self.changed = 0
+        self.unchanged = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, errors))
+
+    def as_dict(self):
+        return {
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'rejected': self.rejected,
+            'errors': [{'line': line, 'errors': errors} for line, errors in self.errors],
+        }
+
+
+def rows_from_json(payload):
+    """(line, row) pairs from a decoded JSON body: a list of rows, or {"rows": [...]}"""
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if not isinstance(payload, list):
+        raise ValueError('Expected a list of rows, or an object with a "rows" list.')
+    return [
+        (line, row if isinstance(row, dict) else {'__error__': 'Expected a JSON object.'})
+        for line, row in enumerate(payload, start=1)
+    ]
+
+
+class InventorySync:
+    """
+    Applies stock and price rows to one seller's products. Each chunk of rows
+    is diffed against the products read in one query, and only the products
+    that actually change are written, with a single bulk_update per chunk.
+    """
+
+    def __init__(self, seller, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.seller = seller
+        self.chunk_size = chunk_size
+
+    def run(self, rows):
+        result = SyncResult()
+        chunk = []
+        for line, row in rows:
+            chunk.append((line, row))
+            if len(chunk) >= self.chunk_size:
+                self._sync(chunk, result)
+                chunk = []
+        if chunk:
+            self._sync(chunk, result)
+        return result
+
+    def _validate(self, chunk, result):
+        valid = []
+        for line, row in chunk:
+            if '__error__' in row:
+                result.reject(line, {'__all__': [row['__error__']]})
+                continue
+            form = ProductSyncRowForm(row)
+            if not form.is_valid():
+                result.reject(line, {field: list(errors) for field, errors in form.errors.items()})
+                continue
+            valid.append((line, form.cleaned_data['id'], form.cleaned_data['slug'], form.changes()))
+        return valid
+
+    def _sync(self, chunk, result):
+        rows = self._validate(chunk, result)
+        ids = {product_id for _, product_id, _, _ in rows if product_id}
+        slugs = {slug for _, product_id, slug, _ in rows if not product_id}
+        products = Product.objects.filter(seller=self.seller).filter(Q(pk__in=ids) | Q(slug__in=slugs)).only(
+            'pk', 'slug', 'effective_price', 'updated_at', *SYNC_FIELDS,
+        )
+        by_id = {product.pk: product for product in products}
+        by_slug = {product.slug: product for product in by_id.values()}
+
+        changed = {}
+        changed_fields = set()
+        availability_changed = price_changed = False
+        for line, product_id, slug, changes in rows:
+            product = by_id.get(product_id) if product_id else by_slug.get(slug)
+            if product is None:
+                result.reject(line, {'__all__': [f'No product "{product_id or slug}" in your catalog.']})
+                continue
+            fields = {field for field, value in changes.items() if getattr(product, field) != value}
+            if not fields:
+                result.unchanged += 1
+                continue
+            for field in fields:
+                setattr(product, field, changes[field])
+            availability_changed |= 'is_available' in fields
+            if {'price', 'discount_price'} & fields:
+                product.effective_price = product.discount_price if product.discount_price is not None else product.price
+                fields.add('effective_price')
+                price_changed = True
+            changed[product.pk] = product
+            changed_fields |= fields
+            result.changed += 1
+
+        if not changed:
+            return
+        now = timezone.now()
+        for product in changed.values():
+            product.updated_at = now
+        with transaction.atomic():
+            # bulk_update skips save signals, so the caches they keep are bumped below
+            Product.objects.bulk_update(changed.values(), [*changed_fields, 'updated_at'])
+            self._invalidate_caches(changed.values(), availability_changed, price_changed)
+            if changed_fields & {'stock', 'is_available'}:
+                seller_context.invalidate(self.seller.pk)
+
+    def _invalidate_caches(self, products, availability_changed, price_changed):
+        slugs = [product.slug for product in products]
+        entry = fragment_cache.peek(FEATURED_PRODUCTS_FRAGMENT)
+        featured = availability_changed or (
+            entry is not None and any(product.pk in entry['product_ids'] for product in products)
+        )
+
+        def invalidate():
+            page_cache.invalidate_many(slugs)
+            if featured:
+                fragment_cache.invalidate(FEATURED_PRODUCTS_FRAGMENT)
+        transaction.on_commit(invalidate)
+        if price_changed:
+            pricing.invalidate_prices()
@@ -0,0 +1,14 @@
+from orders.models import Order
+from taskqueue.registry import task
+from . import rollups
+
+
+@task(atomic=True)
+def record_order_sales(order_id, sign=1):
+    """
+    rollups.record_order for an order that was just paid or refunded. It is
+    atomic, so a retried or taken-over attempt never counts an order twice.
+    """
+    order = Order.objects.filter(pk=order_id).first()
+    if order is not None:
+        rollups.record_order(order, sign)
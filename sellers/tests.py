@@ -1,3 +1,459 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import itertools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from orders.models import Order, OrderItem
+from cart import wishlists
+from cart.counts import get_cart_count
+from cart.models import Cart, CartItem, WishList
+from products.models import Category, Product, ProductImage, ProductReview
+from products import search
+from products.tests import create_product
+from taskqueue.worker import Worker
+from users.models import CustomUser
+from .models import SellerDailySales, SellerProfile
+from .seller_context import SellerContext, get_seller_context
+from . import exports, rollups, seller_context
 
-# Create your tests here.
+logger = logging.getLogger(__name__)
+
+
+def get_context(client, url, params=None):
+    """The context a sellers view renders with, without needing its template"""
+    with patch('sellers.views.render', side_effect=lambda request, template, context: HttpResponse()) as render:
+        client.get(url, params or {})
+    return render.call_args.args[2]
+
+
+def warm_seller_context(seller):
+    """
+    Start from an empty cache holding only the seller's context, so query
+    counts do not depend on what earlier tests left behind
+    """
+    cache.clear()
+    get_seller_context(CustomUser.objects.get(pk=seller.pk))
+
+
+class SellerDailySalesTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        other_seller = CustomUser.objects.create_user(username='other', password='secret', user_type='seller')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        self.first = create_product(self.seller, category, 'first', Decimal('10.00'))
+        self.second = create_product(self.seller, category, 'second', Decimal('4.50'))
+        self.other = create_product(other_seller, category, 'other', Decimal('1.00'))
+
+    def place_order(self, lines):
+        order = Order.objects.create(user=self.buyer, total_amount=0)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product, quantity in lines
+        ])
+        return Order.objects.get(pk=order.pk)
+
+    def pay(self, order, status='completed'):
+        order.payment_status = status
+        order.save()
+        Worker().run_pending()
+
+    def seller_totals(self):
+        return {
+            row.product_id: (row.units, row.revenue, row.orders)
+            for row in SellerDailySales.objects.filter(seller=self.seller)
+        }
+
+    def test_paid_and_refunded_orders_update_the_rollup(self):
+        first_order = self.place_order([(self.first, 2), (self.second, 1), (self.other, 5)])
+        second_order = self.place_order([(self.second, 3)])
+        self.assertEqual(self.seller_totals(), {})
+
+        self.pay(first_order)
+        self.pay(second_order)
+        self.pay(second_order)  # Saving again must not count twice
+        self.assertEqual(self.seller_totals(), {
+            self.first.pk: (2, Decimal('20.00'), 1),
+            self.second.pk: (4, Decimal('18.00'), 1),
+        })
+
+        self.pay(second_order, 'refunded')
+        self.assertEqual(self.seller_totals(), {
+            self.first.pk: (2, Decimal('20.00'), 1),
+            self.second.pk: (1, Decimal('4.50'), 0),
+        })
+
+    def test_rebuild_matches_incremental_totals(self):
+        for lines in ([(self.first, 1)], [(self.first, 2), (self.second, 2)], [(self.second, 1)]):
+            self.pay(self.place_order(lines))
+        self.pay(self.place_order([(self.first, 7)]), 'failed')
+        incremental = self.seller_totals()
+
+        call_command('rebuild_sales_rollup', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(self.seller_totals(), incremental)
+
+
+class SellerOrdersTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        other_seller = CustomUser.objects.create_user(username='other', password='secret', user_type='seller')
+        buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        mine = create_product(self.seller, category, 'mine', Decimal('3.00'))
+        theirs = create_product(other_seller, category, 'theirs', Decimal('100.00'))
+        for i in range(25):
+            order = Order.objects.create(user=buyer, total_amount=0, status='shipped' if i % 5 == 0 else 'pending')
+            OrderItem.objects.create(order=order, product=mine, quantity=i + 1, price=mine.price)
+            OrderItem.objects.create(order=order, product=theirs, quantity=1, price=theirs.price)
+            rollups.record_seller_orders(order, [(self.seller.pk, i + 1, mine.price), (other_seller.pk, 1, theirs.price)])
+        # An order without the seller's products must not show up
+        order = Order.objects.create(user=buyer, total_amount=0)
+        OrderItem.objects.create(order=order, product=theirs, quantity=1, price=theirs.price)
+        rollups.record_seller_orders(order, [(other_seller.pk, 1, theirs.price)])
+        self.client.force_login(self.seller)
+        warm_seller_context(self.seller)
+
+    def get_context(self, params=None):
+        return get_context(self.client, reverse('sellers:orders'), params)
+
+    def test_page_is_grouped_and_totalled_in_the_database(self):
+        # Session, user, orders page, lines for the page
+        with self.assertNumQueries(4):
+            context = self.get_context()
+        orders = context['orders']
+        self.assertEqual(len(orders), 20)
+        self.assertTrue(context['page'].has_next())
+        newest = orders[0]
+        self.assertEqual([item.product.name for item in newest['items']], ['mine'])
+        self.assertEqual(newest['total'], Decimal('75.00'))
+
+        next_page = self.get_context({'cursor': context['page'].next_cursor})
+        self.assertEqual(len(next_page['orders']), 5)
+
+    def test_dashboard_lists_lines_from_the_latest_orders(self):
+        # Session, user, the latest order ids, their lines, the sales rollup
+        with self.assertNumQueries(5):
+            recent = list(get_context(self.client, reverse('sellers:dashboard'))['recent_orders'])
+        self.assertEqual([item.quantity for item in recent], list(range(25, 15, -1)))
+        self.assertEqual({item.product.name for item in recent}, {'mine'})
+
+    def test_status_filter(self):
+        context = self.get_context({'status': 'shipped'})
+        self.assertEqual(len(context['orders']), 5)
+        self.assertEqual({entry['order'].status for entry in context['orders']}, {'shipped'})
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        product = create_product(self.seller, category, 'book', Decimal('2.50'))
+        for day in (1, 2, 3):
+            order = Order.objects.create(user=buyer, total_amount=0)
+            Order.objects.filter(pk=order.pk).update(created_at=datetime.datetime(2026, 1, day, 12, tzinfo=datetime.timezone.utc))
+            OrderItem.objects.create(order=order, product=product, quantity=day, price=product.price)
+        self.client.force_login(self.seller)
+
+    def test_csv_export_with_date_range(self):
+        response = self.client.get(reverse('sellers:export', args=['orders']), {'start': '2026-01-02', 'end': '2026-01-03'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][0], 'order_id')
+        self.assertEqual([(row[6], row[8]) for row in rows[1:]], [('2', '5.00'), ('3', '7.50')])
+
+    def test_jsonl_export_from_command(self):
+        stdout = io.StringIO()
+        call_command('export_seller_data', 'orders', '--end=2026-01-01', seller='seller', format='jsonl', stdout=stdout)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['quantity'], rows[0]['line_total']), (1, '2.50'))
+
+
+@skipUnless(os.environ.get('RUN_BENCHMARKS'), 'set RUN_BENCHMARKS=1 to run benchmarks')
+class ExportMemoryBenchmark(TestCase):
+    """Peak memory while streaming an export must not grow with its row count"""
+    ROWS = int(os.environ.get('EXPORT_BENCHMARK_ROWS', 50000))
+
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        category = Category.objects.create(name='Books', slug='books')
+        product = create_product(self.seller, category, 'book', Decimal('2.50'))
+        order = Order.objects.create(user=buyer, total_amount=0)
+        # Raw inserts keep setting up the large table quick
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {OrderItem._meta.db_table} (order_id, product_id, quantity, price) VALUES (%s, %s, %s, %s)',
+                [(order.pk, product.pk, 1, '2.50')] * self.ROWS,
+            )
+
+    def stream(self, rows):
+        header, lines = exports.export_rows('orders', self.seller)
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = 0
+        for chunk in exports.encode(header, itertools.islice(lines, rows), 'csv'):
+            size += len(chunk)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, elapsed, size
+
+    def test_memory_stays_flat(self):
+        small_peak, _, _ = self.stream(self.ROWS // 10)
+        large_peak, elapsed, size = self.stream(self.ROWS)
+        logger.info(
+            'Exported %d rows (%.1f MB) in %.1fs; peak memory %.2f MB at %d rows, %.2f MB at %d',
+            self.ROWS, size / 1e6, elapsed, small_peak / 1e6, self.ROWS // 10, large_peak / 1e6, self.ROWS,
+        )
+        self.assertLess(large_peak, small_peak * 1.5 + 1e6)
+
+
+class InventorySyncTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        other_seller = CustomUser.objects.create_user(username='other', password='secret', user_type='seller')
+        category = Category.objects.create(name='Books', slug='books')
+        self.products = [create_product(self.seller, category, f'book-{i}', Decimal('10.00')) for i in range(3)]
+        self.foreign = create_product(other_seller, category, 'foreign', Decimal('10.00'))
+        self.client.force_login(self.seller)
+        warm_seller_context(self.seller)
+
+    def sync(self, rows):
+        return self.client.post(reverse('sellers:sync_inventory'), json.dumps({'rows': rows}), content_type='application/json')
+
+    def test_only_changed_rows_are_written(self):
+        first, second, third = self.products
+        rows = [
+            {'id': first.pk, 'stock': 5, 'price': '12.00', 'discount_price': '9.00'},
+            {'slug': second.slug, 'stock': 100, 'price': '10.00'},
+            {'slug': third.slug, 'is_available': False},
+            {'id': self.foreign.pk, 'stock': 0},
+            {'stock': 1},
+        ]
+        # Session, user, the diff read, one bulk UPDATE inside its savepoint
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(6):
+            response = self.sync(rows)
+        data = response.json()
+        self.assertEqual((data['changed'], data['unchanged'], data['rejected']), (2, 1, 2))
+        self.assertEqual(sorted(error['line'] for error in data['errors']), [4, 5])
+
+        first.refresh_from_db()
+        self.assertEqual((first.stock, first.price, first.effective_price), (5, Decimal('12.00'), Decimal('9.00')))
+        third.refresh_from_db()
+        self.assertFalse(third.is_available)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.stock, 100)
+
+    def test_command_reads_csv_and_clears_discounts(self):
+        Product.objects.filter(pk=self.products[0].pk).update(discount_price=Decimal('8.00'), effective_price=Decimal('8.00'))
+        path = os.path.join(self._tmpdir(), 'sync.csv')
+        with open(path, 'w') as f:
+            f.write(f'slug,stock,price,discount_price,is_available\n{self.products[0].slug},7,,,\n')
+        call_command('sync_inventory', path, seller='seller', stdout=io.StringIO())
+        product = Product.objects.get(pk=self.products[0].pk)
+        self.assertEqual((product.stock, product.discount_price, product.effective_price), (7, None, Decimal('10.00')))
+
+    def _tmpdir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return directory
+
+
+class SellerProductManagerTest(TestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        other_seller = CustomUser.objects.create_user(username='other', password='secret', user_type='seller')
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.novels = Category.objects.create(name='Novels', slug='novels', parent=self.books)
+        games = Category.objects.create(name='Games', slug='games')
+        self.products = [
+            create_product(self.seller, self.novels if i % 2 else games, f'item-{i}', Decimal('10.00'))
+            for i in range(60)
+        ]
+        Product.objects.filter(pk=self.products[0].pk).update(stock=0)
+        self.foreign = create_product(other_seller, games, 'foreign', Decimal('10.00'))
+        self.client.force_login(self.seller)
+        warm_seller_context(self.seller)
+
+    def get_context(self, params=None):
+        return get_context(self.client, reverse('sellers:products'), params)
+
+    def bulk(self, data, params=''):
+        return self.client.post(reverse('sellers:bulk_products') + params, data)
+
+    def test_list_is_paginated_and_filtered(self):
+        context = self.get_context()
+        self.assertEqual(len(context['products']), 50)
+        self.assertTrue(context['products'].has_next())
+        self.assertEqual(len(self.get_context({'category': self.books.pk})['products']), 30)
+        out_of_stock = self.get_context({'stock': 'out'})['products']
+        self.assertEqual([product.pk for product in out_of_stock], [self.products[0].pk])
+
+    def test_bulk_actions_are_scoped_to_the_seller(self):
+        with self.assertNumQueries(6):
+            self.bulk({'action': 'make_unavailable', 'product_ids': [self.products[1].pk, self.foreign.pk]})
+        self.assertEqual(
+            set(Product.objects.filter(is_available=False).values_list('pk', flat=True)), {self.products[1].pk},
+        )
+
+        self.bulk({'action': 'delete', 'product_ids': [self.foreign.pk]})
+        self.assertTrue(Product.objects.filter(pk=self.foreign.pk).exists())
+
+    def test_adjust_price_for_all_filtered_products(self):
+        Product.objects.filter(pk=self.products[1].pk).update(discount_price=Decimal('8.00'), effective_price=Decimal('8.00'))
+        self.bulk({'action': 'adjust_price', 'percent': '-12.5', 'apply_to_all': 'on'}, f'?category={self.novels.pk}')
+        novel = Product.objects.get(pk=self.products[1].pk)
+        self.assertEqual((novel.price, novel.discount_price, novel.effective_price), (Decimal('8.75'), Decimal('7.00'), Decimal('7.00')))
+        self.assertEqual(Product.objects.get(pk=self.products[2].pk).price, Decimal('10.00'))
+        self.assertEqual(Product.objects.filter(category=self.novels, price=Decimal('8.75')).count(), 30)
+        self.assertEqual(Product.objects.get(pk=self.foreign.pk).price, Decimal('10.00'))
+
+    def test_bulk_delete(self):
+        self.bulk({'action': 'delete', 'apply_to_all': 'on'}, '?stock=out')
+        self.assertEqual(Product.objects.filter(seller=self.seller).count(), 59)
+
+    def buyer_with_related_rows(self):
+        buyer = CustomUser.objects.create_user(username='buyer', password='secret')
+        novels = [product for product in self.products if product.category_id == self.novels.pk]
+        for product in novels:
+            ProductReview.objects.create(product=product, user=buyer, rating=5, comment='Great')
+            ProductImage.objects.create(product=product, image=f'product_images/{product.slug}.jpg')
+        order = Order.objects.create(user=buyer, total_amount=0)
+        OrderItem.objects.create(order=order, product=novels[0], quantity=1, price=novels[0].price)
+        CartItem.objects.create(cart=Cart.objects.create(user=buyer), product=novels[0], quantity=1)
+        WishList.objects.create(user=buyer).products.add(novels[0], self.foreign)
+        # Warm the buyer's cart badge and wishlist ids
+        self.assertEqual(self.buyer_caches(buyer), (1, {novels[0].pk, self.foreign.pk}))
+        return buyer
+
+    def buyer_caches(self, buyer):
+        request = RequestFactory().get('/')
+        request.user = CustomUser.objects.get(pk=buyer.pk)
+        return get_cart_count(request), set(wishlists.get_wishlist_ids(request.user))
+
+    def assertRelatedRowsDeleted(self, buyer):
+        self.assertEqual(Product.objects.filter(seller=self.seller).count(), 30)
+        self.assertFalse(ProductReview.objects.exists() or ProductImage.objects.exists() or CartItem.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(list(buyer.wishlist.products.all()), [self.foreign])
+        self.assertEqual(search.search(Product.objects.all(), 'item').count(), 30)
+        self.assertEqual(self.buyer_caches(buyer), (0, {self.foreign.pk}))
+
+    def test_bulk_delete_is_set_based(self):
+        buyer = self.buyer_with_related_rows()
+        # Session, user, category tree, the slugs, the carts and wishlists holding them, one DELETE
+        # per related table, the search index, the products, and the savepoint around them
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(16):
+            self.bulk({'action': 'delete', 'apply_to_all': 'on'}, f'?category={self.novels.pk}')
+        self.assertRelatedRowsDeleted(buyer)
+
+    def test_bulk_delete_falls_back_to_the_collector(self):
+        buyer = self.buyer_with_related_rows()
+        with self.captureOnCommitCallbacks(execute=True), patch('sellers.views._cascades_to_leaves', return_value=False):
+            self.bulk({'action': 'delete', 'apply_to_all': 'on'}, f'?category={self.novels.pk}')
+        self.assertRelatedRowsDeleted(buyer)
+
+
+class SellerContextTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.category = Category.objects.create(name='Books', slug='books')
+        create_product(self.seller, self.category, 'book', Decimal('10.00'))
+        self.client.force_login(self.seller)
+
+    def get_context(self, name):
+        return get_context(self.client, reverse(name))
+
+    def test_profile_page_reuses_cached_context(self):
+        self.assertEqual(self.get_context('sellers:profile')['profile'].company_name, "seller's Store")
+        SellerProfile.objects.filter(user=self.seller).update(logo='seller_logos/shop.png')
+        cache.clear()
+        self.get_context('sellers:profile')
+        # Session and user only, and the profile is the model templates expect
+        with self.assertNumQueries(2):
+            profile = self.get_context('sellers:profile')['profile']
+            self.assertIsInstance(profile, SellerProfile)
+            self.assertEqual((profile.logo.url, profile.user.username), ('/media/seller_logos/shop.png', 'seller'))
+            self.assertIsNotNone(profile.created_at)
+
+    def test_a_load_racing_a_change_is_not_served_afterwards(self):
+        load = SellerContext.load
+
+        def racing_load(user):
+            context = load(user)
+            # The profile is edited while this request is still building the old context
+            with self.captureOnCommitCallbacks(execute=True):
+                SellerProfile.objects.filter(user=user).update(company_name='Renamed')
+                seller_context.invalidate(user.pk)
+            return context
+
+        with patch.object(SellerContext, 'load', side_effect=racing_load):
+            self.assertEqual(get_seller_context(CustomUser.objects.get(pk=self.seller.pk)).profile.company_name, "seller's Store")
+        self.assertEqual(get_seller_context(CustomUser.objects.get(pk=self.seller.pk)).profile.company_name, 'Renamed')
+
+    def test_context_follows_profile_and_product_changes(self):
+        self.assertEqual(self.get_context('sellers:dashboard')['total_products'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_product(self.seller, self.category, 'another', Decimal('5.00'))
+            profile = SellerProfile.objects.get(user=self.seller)
+            profile.company_name = 'Renamed'
+            profile.save()
+        context = self.get_context('sellers:dashboard')
+        self.assertEqual((context['total_products'], context['seller_profile'].company_name), (2, 'Renamed'))
+
+
+class AddProductImagesTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.seller = CustomUser.objects.create_user(username='seller', password='secret', user_type='seller')
+        self.category = Category.objects.create(name='Books', slug='books')
+        self.client.force_login(self.seller)
+
+    def upload(self, name, size):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_images_are_scaled_down_by_the_worker(self):
+        response = self.client.post(reverse('sellers:add_product'), {
+            'category': self.category.pk, 'name': 'Atlas', 'description': 'Maps', 'price': '20.00',
+            'stock': 3, 'is_available': 'on',
+            'images': [self.upload('big.jpg', (3200, 1000)), self.upload('small.jpg', (400, 300))],
+        })
+        self.assertRedirects(response, reverse('sellers:products'), fetch_redirect_response=False)
+        big, small = ProductImage.objects.filter(product__name='Atlas').order_by('pk')
+        with Image.open(big.image.path) as image:
+            self.assertEqual(image.size, (3200, 1000))
+
+        original_path = big.image.path
+        self.assertEqual(Worker().run_pending(), 1)
+        big.refresh_from_db()
+        with Image.open(big.image.path) as image:
+            self.assertEqual(image.size, (1600, 500))
+        # Written under a new name before the original was removed
+        self.assertNotEqual(big.image.path, original_path)
+        self.assertFalse(os.path.exists(original_path))
+        with Image.open(small.image.path) as image:
+            self.assertEqual(image.size, (400, 300))
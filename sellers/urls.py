@@ -7,10 +7,14 @@ urlpatterns = [
     path('dashboard/', views.seller_dashboard, name='dashboard'),
     path('products/', views.seller_products, name='products'),
     path('products/add/', views.add_product, name='add_product'),
+    path('products/bulk/', views.bulk_products, name='bulk_products'),
+    path('products/import/', views.import_products, name='import_products'),
+    path('products/sync/', views.sync_inventory, name='sync_inventory'),
     path('products/edit/<int:product_id>/', views.edit_product, name='edit_product'),
     path('products/delete/<int:product_id>/', views.delete_product, name='delete_product'),
     path('orders/', views.seller_orders, name='orders'),
     path('profile/', views.seller_profile, name='profile'),
     path('profile/edit/', views.edit_seller_profile, name='edit_profile'),
     path('analytics/', views.seller_analytics, name='analytics'),
+    path('export/<str:kind>/', views.export_data, name='export'),
 ]
\ No newline at end of file
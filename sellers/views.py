@@ -1,54 +1,79 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count
-from .models import SellerProfile
+import json
+from functools import wraps
+from collections import defaultdict
+from urllib.parse import urlencode
+from django.db import transaction
+from django.db.models import CASCADE, DecimalField, F, Sum, Value
+from django.db.models.functions import Round
+from django.urls import reverse
+from django.utils import timezone
+from .models import SellerDailySales, SellerOrder, SellerProfile
 from products.models import Product, ProductImage
 from orders.models import Order, OrderItem
-from .forms import SellerProfileForm
+from .forms import SellerProfileForm, ProductImportForm, SellerExportForm, ProductBulkActionForm
+from .sync import InventorySync, rows_from_json
+from .seller_context import get_seller_context
+from . import exports, seller_context
 from products.forms import ProductForm
+from products.importer import ProductImporter, read_rows
+from products.tasks import process_product_images
+from products.pagination import CursorPaginator
+from products.fragment_cache import FEATURED_PRODUCTS_FRAGMENT
+from products import category_tree, fragment_cache, page_cache, search
+from cart import pricing, wishlists
+from cart.counts import reset_user_cart_counts
+from cart.models import CartItem, WishList
+
+SELLER_ORDERS_PER_PAGE = 20
+SELLER_PRODUCTS_PER_PAGE = 50
+RECENT_ORDERS = 10
 
 def seller_required(view_func):
-    """Decorator to ensure user is a seller"""
+    """Decorator to ensure user is a seller; attaches the cached seller context as request.seller"""
     @login_required
+    @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
         if request.user.user_type != 'seller':
             messages.error(request, 'You need a seller account to access this page.')
             return redirect('home')
+        request.seller = get_seller_context(request.user)
         return view_func(request, *args, **kwargs)
     return _wrapped_view
 
 @seller_required
 def seller_dashboard(request):
     """Seller dashboard with overview of products, orders, and analytics"""
-    # Get seller profile
-    seller_profile, created = SellerProfile.objects.get_or_create(
-        user=request.user,
-        defaults={'company_name': request.user.username + "'s Store"}
-    )
+    seller = request.seller
     
-    # Get seller's products
-    products = Product.objects.filter(seller=request.user)
-    
-    # Get recent orders for seller's products
+    # Lines from the seller's most recent orders, whose ids come off the
+    # (seller, created_at) index of the seller's own orders
+    recent_order_ids = list(SellerOrder.objects.filter(seller=request.user).order_by(
+        '-created_at', '-pk'
+    ).values_list('order_id', flat=True)[:RECENT_ORDERS])
     order_items = OrderItem.objects.filter(
-        product__seller=request.user
-    ).select_related('order', 'product').order_by('-order__created_at')[:10]
+        order__in=recent_order_ids, product__seller=request.user
+    ).select_related('order', 'product').order_by('-order__created_at', '-order_id', 'pk')[:RECENT_ORDERS]
     
-    # Basic analytics
-    total_products = products.count()
-    active_products = products.filter(is_available=True).count()
-    out_of_stock = products.filter(stock=0).count()
-    total_orders = OrderItem.objects.filter(product__seller=request.user).values('order').distinct().count()
+    # Product counts come with the cached seller context
+    total_products = seller.total_products
+    active_products = seller.active_products
+    out_of_stock = seller.out_of_stock
     
-    # Sales data
-    total_sales = OrderItem.objects.filter(
-        product__seller=request.user,
-        order__payment_status='completed'
-    ).aggregate(total=Sum('price'))['total'] or 0
+    # Sales data, from the daily rollup instead of the order history
+    sales = SellerDailySales.objects.filter(seller=request.user).aggregate(
+        orders=Sum('orders'),
+        revenue=Sum('revenue'),
+    )
+    total_orders = sales['orders'] or 0
+    total_sales = sales['revenue'] or 0
     
     context = {
-        'seller_profile': seller_profile,
+        'seller_profile': seller.profile,
         'total_products': total_products,
         'active_products': active_products,
         'out_of_stock': out_of_stock,
@@ -58,16 +83,172 @@ def seller_dashboard(request):
     }
     return render(request, 'sellers/dashboard.html', context)
 
+def _filter_seller_products(seller, params):
+    """The seller's products narrowed by the list filters in params, and the filters that applied"""
+    products = Product.objects.filter(seller=seller)
+    filters = {}
+    
+    availability = params.get('availability')
+    if availability in ('available', 'unavailable'):
+        products = products.filter(is_available=availability == 'available')
+        filters['availability'] = availability
+    if params.get('stock') == 'out':
+        products = products.filter(stock=0)
+        filters['stock'] = 'out'
+    
+    # A category includes its subcategories at any depth
+    category_id = params.get('category')
+    category = category_tree.get_tree().get(int(category_id)) if category_id and category_id.isdigit() else None
+    if category is not None:
+        products = products.filter(category__in=category_tree.get_tree().descendant_ids(category))
+        filters['category'] = category.id
+    return products, filters
+
 @seller_required
 def seller_products(request):
     """View to display seller's products"""
-    products = Product.objects.filter(seller=request.user).order_by('-created_at')
+    products_list, filters = _filter_seller_products(request.user, request.GET)
+    
+    # Cursor pagination over the (seller, created_at) index
+    paginator = CursorPaginator(products_list.cards(), SELLER_PRODUCTS_PER_PAGE, ordering='-created_at')
+    products = paginator.page(request.GET.get('cursor'))
     
     context = {
         'products': products,
+        'filters': filters,
+        'filter_query': urlencode(filters),
+        'categories': category_tree.get_tree().roots,
+        'bulk_form': ProductBulkActionForm(),
     }
     return render(request, 'sellers/products.html', context)
 
+def _cascades_to_leaves():
+    """
+    Whether deleting a product only ever cascades to rows that nothing else
+    references, so each related table can be cleared with one raw DELETE.
+    """
+    for relation in Product._meta.related_objects:
+        if relation.many_to_many:
+            related = relation.through._meta
+            if not related.auto_created:
+                return False
+        else:
+            related = relation.related_model._meta
+            if relation.on_delete is not CASCADE:
+                return False
+        if related.related_objects or related.many_to_many:
+            return False
+    return True
+
+def _delete_products(products):
+    """
+    Delete products with one DELETE per table that references them, then
+    the products themselves. queryset.delete() would load every product,
+    review and image and run their delete signals one row at a time, so
+    the bookkeeping those signals do is done here for the whole batch.
+    """
+    deleting = dict(products.values_list('pk', 'slug'))
+    if not deleting:
+        return 0
+    entry = fragment_cache.peek(FEATURED_PRODUCTS_FRAGMENT)
+    featured = entry is not None and not deleting.keys().isdisjoint(entry['product_ids'])
+    
+    ids = products.values('pk')
+    # Carts and wishlists losing products, whose cached counts and ids go stale
+    cart_user_ids = set(CartItem.objects.filter(product__in=ids).values_list('cart__user', flat=True))
+    wishlist_user_ids = set(WishList.objects.filter(products__in=ids).values_list('user', flat=True))
+    
+    if _cascades_to_leaves():
+        for relation in Product._meta.related_objects:
+            if relation.many_to_many:
+                lookup = f'{relation.field.m2m_reverse_field_name()}__in'
+                rows = relation.through.objects.filter(**{lookup: ids})
+            else:
+                rows = relation.related_model.objects.filter(**{f'{relation.field.name}__in': ids})
+            rows._raw_delete(rows.db)
+        search.remove_products(deleting)
+        selected = Product.objects.filter(pk__in=ids)
+        deleted = selected._raw_delete(selected.db)
+    else:
+        # A relation protects products, nulls its column or cascades further,
+        # which only Django's collector handles
+        deleted = Product.objects.filter(pk__in=ids).delete()[1].get(Product._meta.label, 0)
+    
+    pricing.invalidate_prices()
+    slugs = list(deleting.values())
+    
+    def invalidate():
+        page_cache.invalidate_many(slugs)
+        if featured:
+            fragment_cache.invalidate(FEATURED_PRODUCTS_FRAGMENT)
+        reset_user_cart_counts(cart_user_ids)
+        for user_id in wishlist_user_ids:
+            wishlists.invalidate(user_id)
+    transaction.on_commit(invalidate)
+    return deleted
+
+def _apply_bulk_action(products, action, percent=None):
+    """
+    Run one bulk action over a queryset of the seller's products as a single
+    UPDATE, or a DELETE cascading to their related rows; returns how many
+    products it changed. Updates skip save signals, so they read the affected
+    slugs first and drop the caches those signals would have.
+    """
+    if action == 'delete':
+        return _delete_products(products)
+    
+    now = timezone.now()
+    if action in ('make_available', 'make_unavailable'):
+        is_available = action == 'make_available'
+        products = products.exclude(is_available=is_available)
+        changing = dict(products.values_list('pk', 'slug'))
+        updated = products.update(is_available=is_available, updated_at=now)
+        # Products entering or leaving the storefront change the featured block
+        featured = bool(changing)
+    else:
+        factor = Value(1 + percent / 100, output_field=DecimalField(max_digits=7, decimal_places=4))
+        changing = dict(products.values_list('pk', 'slug'))
+        updated = products.update(
+            price=Round(F('price') * factor, 2),
+            discount_price=Round(F('discount_price') * factor, 2),
+            effective_price=Round(Product.effective_price_expression() * factor, 2),
+            updated_at=now,
+        )
+        entry = fragment_cache.peek(FEATURED_PRODUCTS_FRAGMENT)
+        featured = entry is not None and not changing.keys().isdisjoint(entry['product_ids'])
+        pricing.invalidate_prices()
+    slugs = list(changing.values())
+    
+    def invalidate():
+        page_cache.invalidate_many(slugs)
+        if featured:
+            fragment_cache.invalidate(FEATURED_PRODUCTS_FRAGMENT)
+    transaction.on_commit(invalidate)
+    return updated
+
+@require_POST
+@seller_required
+def bulk_products(request):
+    """Apply one action to the selected products, or to every product matching the list filters"""
+    products, filters = _filter_seller_products(request.user, request.GET)
+    redirect_url = reverse('sellers:products') + (f'?{urlencode(filters)}' if filters else '')
+    
+    form = ProductBulkActionForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, ' '.join(error for errors in form.errors.values() for error in errors))
+        return redirect(redirect_url)
+    
+    if not form.cleaned_data['apply_to_all']:
+        products = products.filter(pk__in=form.cleaned_data['product_ids'])
+    action = form.cleaned_data['action']
+    with transaction.atomic():
+        count = _apply_bulk_action(products, action, form.cleaned_data['percent'])
+        seller_context.invalidate(request.user.pk)
+    
+    messages.success(request, f'{dict(ProductBulkActionForm.ACTION_CHOICES)[action]}: {count} products updated.'
+                     if action != 'delete' else f'Deleted {count} products.')
+    return redirect(redirect_url)
+
 @seller_required
 def add_product(request):
     """View to add a new product"""
@@ -78,14 +259,17 @@ def add_product(request):
             product.seller = request.user
             product.save()
             
-            # Handle product images
+            # Handle product images; resizing and rotating them is left to the task worker
             images = request.FILES.getlist('images')
+            image_ids = []
             for i, image in enumerate(images):
-                ProductImage.objects.create(
+                image_ids.append(ProductImage.objects.create(
                     product=product,
                     image=image,
                     is_primary=(i == 0)  # First image is primary
-                )
+                ).pk)
+            if image_ids:
+                process_product_images.delay(image_ids)
             
             messages.success(request, 'Product added successfully!')
             return redirect('sellers:products')
@@ -98,6 +282,31 @@ def add_product(request):
     }
     return render(request, 'sellers/product_form.html', context)
 
+@seller_required
+def import_products(request):
+    """View to bulk-create products from an uploaded CSV or JSONL catalog"""
+    result = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Rows are streamed from the uploaded file and written in chunks
+            importer = ProductImporter(request.user)
+            result = importer.run(read_rows(form.cleaned_data['file'], form.cleaned_data['format']))
+            
+            if result.created:
+                seller_context.invalidate(request.user.pk)
+                messages.success(request, f'Imported {result.created} products.')
+            if result.failed:
+                messages.warning(request, f'{result.failed} rows could not be imported.')
+    else:
+        form = ProductImportForm()
+    
+    context = {
+        'form': form,
+        'result': result,
+    }
+    return render(request, 'sellers/import_products.html', context)
+
 @seller_required
 def edit_product(request, product_id):
     """View to edit an existing product"""
@@ -149,38 +358,53 @@ def delete_product(request, product_id):
 @seller_required
 def seller_orders(request):
     """View to display orders for seller's products"""
-    # Get orders containing seller's products
-    order_items = OrderItem.objects.filter(
-        product__seller=request.user
-    ).select_related('order', 'product').order_by('-order__created_at')
-    
-    # Group by order
-    orders_dict = {}
-    for item in order_items:
-        if item.order.id not in orders_dict:
-            orders_dict[item.order.id] = {
-                'order': item.order,
-                'items': [],
-                'total': 0,
-            }
-        orders_dict[item.order.id]['items'].append(item)
-        orders_dict[item.order.id]['total'] += item.total_price
+    # The seller's own rows, newest first, straight off the (seller, created_at) index
+    orders_list = SellerOrder.objects.filter(seller=request.user).select_related('order')
+    
+    # Apply filters
+    status = request.GET.get('status')
+    if status in dict(Order.STATUS_CHOICES):
+        orders_list = orders_list.filter(order__status=status)
+    else:
+        status = None
+    payment_status = request.GET.get('payment_status')
+    if payment_status in dict(Order.PAYMENT_STATUS_CHOICES):
+        orders_list = orders_list.filter(order__payment_status=payment_status)
+    else:
+        payment_status = None
+    
+    paginator = CursorPaginator(orders_list, SELLER_ORDERS_PER_PAGE, ordering='-created_at')
+    page = paginator.page(request.GET.get('cursor'))
+    
+    # Only the current page's lines are loaded, in one query
+    items_by_order = defaultdict(list)
+    for item in OrderItem.objects.filter(
+        order__in=[entry.order_id for entry in page], product__seller=request.user
+    ).select_related('product').order_by('pk'):
+        items_by_order[item.order_id].append(item)
     
     context = {
-        'orders': orders_dict.values(),
+        'orders': [
+            {
+                'order': entry.order,
+                'items': items_by_order[entry.order_id],
+                'total': entry.subtotal,
+            }
+            for entry in page
+        ],
+        'page': page,
+        'status': status,
+        'payment_status': payment_status,
+        'status_choices': Order.STATUS_CHOICES,
+        'payment_status_choices': Order.PAYMENT_STATUS_CHOICES,
     }
     return render(request, 'sellers/orders.html', context)
 
 @seller_required
 def seller_profile(request):
     """View to display seller profile"""
-    profile, created = SellerProfile.objects.get_or_create(
-        user=request.user,
-        defaults={'company_name': request.user.username + "'s Store"}
-    )
-    
     context = {
-        'profile': profile,
+        'profile': request.seller.profile,
     }
     return render(request, 'sellers/profile.html', context)
 
@@ -210,32 +434,28 @@ def edit_seller_profile(request):
 def seller_analytics(request):
     """View to display analytics data for seller"""
     # Product statistics
-    products = Product.objects.filter(seller=request.user)
-    total_products = products.count()
+    total_products = request.seller.total_products
     
-    # Sales statistics
-    order_items = OrderItem.objects.filter(
-        product__seller=request.user,
-        order__payment_status='completed'
-    )
+    # Sales statistics, from the daily rollup instead of the order history
+    sales = SellerDailySales.objects.filter(seller=request.user)
     
     # Total sales
-    total_sales = order_items.aggregate(total=Sum('price'))['total'] or 0
+    total_sales = sales.aggregate(total=Sum('revenue'))['total'] or 0
     
     # Sales by product
-    sales_by_product = order_items.values(
+    sales_by_product = sales.values(
         'product__id', 'product__name'
     ).annotate(
-        total_sales=Sum('price'),
-        units_sold=Sum('quantity')
-    ).order_by('-total_sales')
+        total_sales=Sum('revenue'),
+        units_sold=Sum('units')
+    ).filter(units_sold__gt=0).order_by('-total_sales')
     
     # Most popular products
-    popular_products = order_items.values(
+    popular_products = sales.values(
         'product__id', 'product__name'
     ).annotate(
-        units_sold=Sum('quantity')
-    ).order_by('-units_sold')[:5]
+        units_sold=Sum('units')
+    ).filter(units_sold__gt=0).order_by('-units_sold')[:5]
     
     context = {
         'total_products': total_products,
@@ -243,4 +463,33 @@ def seller_analytics(request):
         'sales_by_product': sales_by_product,
         'popular_products': popular_products,
     }
-    return render(request, 'sellers/analytics.html', context)
\ No newline at end of file
+    return render(request, 'sellers/analytics.html', context)
+
+@seller_required
+def export_data(request, kind):
+    """Stream the seller's order lines or daily sales as CSV or JSONL, optionally for a date range"""
+    if kind not in exports.KINDS:
+        raise Http404
+    
+    form = SellerExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, ' '.join(error for errors in form.errors.values() for error in errors))
+        return redirect('sellers:orders' if kind == 'orders' else 'sellers:analytics')
+    
+    format, start, end = form.cleaned_data['format'], form.cleaned_data['start'], form.cleaned_data['end']
+    header, rows = exports.export_rows(kind, request.user, start, end)
+    response = StreamingHttpResponse(exports.encode(header, rows, format), content_type=exports.CONTENT_TYPES[format])
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(kind, format, start, end)}"'
+    return response
+
+@require_POST
+@seller_required
+def sync_inventory(request):
+    """JSON API: apply a batch of stock and price rows to the seller's products, writing only what changed"""
+    try:
+        rows = rows_from_json(json.loads(request.body))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    result = InventorySync(request.user).run(rows)
+    return JsonResponse(result.as_dict())
\ No newline at end of file
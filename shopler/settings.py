@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'orders',
     'cart',
     'sellers',
+    'taskqueue',
 ]
 
 MIDDLEWARE = [
@@ -60,7 +61,9 @@ AUTHENTICATION_BACKENDS = [
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
 
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# Mail is queued and sent by the task worker (manage.py runworker) with TASKS_EMAIL_BACKEND
+EMAIL_BACKEND = 'taskqueue.mail.EmailBackend'
+TASKS_EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 ROOT_URLCONF = 'shopler.urls'
 
@@ -75,6 +78,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'products.context_processors.categories',
+                'cart.context_processors.cart',
             ],
         },
     },
@@ -94,6 +99,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Page and fragment caches are invalidated by bumping version keys, so every
+# process must share the same backend in production (e.g. Redis or Memcached)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shopler',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+def serialize_message(message):
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': message.extra_headers,
+        'alternatives': [list(alternative) for alternative in getattr(message, 'alternatives', [])],
+        'content_subtype': message.content_subtype,
+    }
+
+
+class EmailBackend(BaseEmailBackend):
+    """
+    Queues outgoing mail, such as allauth's verification messages, for the
+    task worker, which delivers it with settings.TASKS_EMAIL_BACKEND. Mail
+    with attachments is sent right away, since task arguments are JSON.
+    """
+
+    def send_messages(self, email_messages):
+        from .tasks import send_email
+
+        immediate = [message for message in email_messages if message.attachments]
+        for message in email_messages:
+            if not message.attachments:
+                send_email.delay(serialize_message(message))
+        if immediate:
+            get_connection(settings.TASKS_EMAIL_BACKEND, fail_silently=self.fail_silently).send_messages(immediate)
+        return len(email_messages)
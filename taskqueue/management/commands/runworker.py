@@ -0,0 +1,28 @@
+import signal
+from django.core.management.base import BaseCommand, CommandError
+from taskqueue.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks until stopped. Start as many workers as needed; they share the queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Tasks run at the same time, each in its own thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between checks of an idle queue')
+        parser.add_argument('--burst', action='store_true', help='Exit once no tasks are due')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        worker = Worker(concurrency=options['concurrency'], poll_interval=options['poll_interval'])
+
+        # Finish the running tasks on Ctrl-C or SIGTERM, but claim no new ones
+        def stop(signum, frame):
+            self.stdout.write('Stopping once running tasks finish...')
+            worker.stop()
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(f'Worker {worker.name} running {options["concurrency"]} tasks at a time.')
+        worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from functools import update_wrapper
+from django.utils import timezone
+from .models import Task
+
+DEFAULT_MAX_ATTEMPTS = 5
+# Seconds before the first retry; each further retry waits twice as long, up to MAX_RETRY_DELAY
+DEFAULT_RETRY_BACKOFF = 30
+MAX_RETRY_DELAY = 60 * 60
+# Visibility timeout: how long a claimed task may run before another worker may take it over
+DEFAULT_TIMEOUT = 5 * 60
+
+_registry = {}
+
+
+class TaskFunction:
+    """
+    A function registered with @task. Calling it runs it inline; delay()
+    queues the call for a worker instead. Arguments must be JSON
+    serializable, so pass ids rather than model instances.
+    """
+
+    def __init__(self, func, name, max_attempts, retry_backoff, timeout, atomic):
+        update_wrapper(self, func)
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.atomic = atomic
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        Queue the call. The row is written in the caller's transaction, so
+        a worker only sees it once that commits, and never if it rolls back.
+        """
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, countdown=0):
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs or {},
+            max_attempts=self.max_attempts,
+            run_at=timezone.now() + timedelta(seconds=countdown),
+        )
+
+    def retry_delay(self, attempts):
+        """How long to wait before retrying after the given number of failed attempts"""
+        return timedelta(seconds=min(self.retry_backoff * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def task(func=None, *, name=None, max_attempts=DEFAULT_MAX_ATTEMPTS, retry_backoff=DEFAULT_RETRY_BACKOFF,
+         timeout=DEFAULT_TIMEOUT, atomic=False):
+    """
+    Register a function as a background task, as @task or @task(...).
+
+    A task that raises is retried with exponential backoff until it has
+    had max_attempts. Tasks run at least once: one that outlives its
+    timeout may be run again by another worker, so they should be safe to
+    repeat. With atomic=True the task's database writes commit together
+    with it being marked done, which makes those writes exactly-once.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        if task_name in _registry:
+            raise ValueError(f'A task named "{task_name}" is already registered.')
+        _registry[task_name] = TaskFunction(func, task_name, max_attempts, retry_backoff, timeout, atomic)
+        return _registry[task_name]
+
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    return _registry.get(name)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from .registry import task
+
+
+@task
+def send_email(message):
+    """Deliver a message queued by taskqueue.mail.EmailBackend"""
+    email = EmailMultiAlternatives(
+        subject=message['subject'],
+        body=message['body'],
+        from_email=message['from_email'],
+        to=message['to'],
+        cc=message['cc'],
+        bcc=message['bcc'],
+        reply_to=message['reply_to'],
+        headers=message['headers'],
+        alternatives=[tuple(alternative) for alternative in message['alternatives']],
+        connection=get_connection(settings.TASKS_EMAIL_BACKEND),
+    )
+    email.content_subtype = message['content_subtype']
+    email.send()
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import Task
+from .registry import task
+from .worker import Worker
+
+calls = []
+
+
+@task(max_attempts=3, retry_backoff=10)
+def remember(value, times=1):
+    calls.extend([value] * times)
+
+
+@task(max_attempts=3, retry_backoff=10)
+def flaky(failures):
+    calls.append('attempt')
+    if len(calls) <= failures:
+        raise RuntimeError('Not yet')
+
+
+@task(atomic=True, timeout=60)
+def write_marker():
+    Task.objects.create(name='marker')
+
+
+class WorkerTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_failing(self):
+        with self.assertLogs('taskqueue.worker', 'WARNING'):
+            return Worker().run_pending()
+
+    def make_due(self):
+        Task.objects.filter(status='queued').update(run_at=timezone.now())
+
+    def test_queued_calls_run_once(self):
+        queued = remember.delay('a', times=2)
+        self.assertEqual(calls, [])
+        self.assertEqual(Worker().run_pending(), 1)
+        self.assertEqual(Worker().run_pending(), 0)
+        queued.refresh_from_db()
+        self.assertEqual((calls, queued.status, queued.attempts), (['a', 'a'], 'done', 1))
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        queued = flaky.delay(failures=5)
+        before = timezone.now()
+        self.run_failing()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('Not yet', queued.last_error)
+        self.assertGreaterEqual(queued.run_at, before + timedelta(seconds=10))
+        # Not due yet
+        self.assertEqual(Worker().run_pending(), 0)
+
+        self.make_due()
+        self.run_failing()
+        queued.refresh_from_db()
+        self.assertGreaterEqual(queued.run_at, before + timedelta(seconds=20))
+
+        self.make_due()
+        self.run_failing()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, len(calls)), ('failed', 3, 3))
+
+    def test_retry_succeeds(self):
+        queued = flaky.delay(failures=1)
+        self.run_failing()
+        self.make_due()
+        Worker().run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), ('done', 2, ''))
+
+    def test_timed_out_task_is_taken_over(self):
+        queued = write_marker.delay()
+        stalled, other = Worker(), Worker()
+        other.name = 'other-host:1'
+        [first_attempt] = stalled.claim(1)
+        self.assertEqual(other.claim(1), [])
+
+        Task.objects.filter(pk=queued.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        [second_attempt] = other.claim(1)
+        self.assertEqual(second_attempt.attempts, 2)
+
+        # The first worker finishing late must not write anything or touch the new attempt
+        with self.assertLogs('taskqueue.worker', 'WARNING'):
+            stalled.execute(first_attempt)
+        self.assertFalse(Task.objects.filter(name='marker').exists())
+        other.execute(second_attempt)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, Task.objects.filter(name='marker').count()), ('done', 1))
+
+    def test_unknown_and_exhausted_tasks_fail(self):
+        unknown = Task.objects.create(name='taskqueue.tests.gone')
+        exhausted = write_marker.delay()
+        Task.objects.filter(pk=exhausted.pk).update(
+            status='running', attempts=5, max_attempts=5, locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(Worker().run_pending(), 0)
+        self.assertEqual(
+            set(Task.objects.filter(pk__in=[unknown.pk, exhausted.pk]).values_list('status', flat=True)), {'failed'},
+        )
+
+
+@override_settings(
+    EMAIL_BACKEND='taskqueue.mail.EmailBackend',
+    TASKS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTest(TestCase):
+    def test_mail_is_sent_by_the_worker(self):
+        message = mail.EmailMultiAlternatives('Confirm', 'Plain', 'shop@example.com', ['buyer@example.com'])
+        message.attach_alternative('<p>Html</p>', 'text/html')
+        message.send()
+        self.assertEqual(mail.outbox, [])
+
+        Worker().run_pending()
+        [sent] = mail.outbox
+        self.assertEqual((sent.subject, sent.to, sent.alternatives), (
+            'Confirm', ['buyer@example.com'], [('<p>Html</p>', 'text/html')],
+        ))
@@ -0,0 +1,130 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Task
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+# Due tasks read per claim, per free slot; some may be taken by other workers first
+CLAIM_LOOKAHEAD = 4
+
+
+class LeaseLost(Exception):
+    """The task outlived its timeout and was claimed by another worker"""
+
+
+def _claimable(now):
+    return Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+class Worker:
+    """
+    Claims due tasks and runs them, up to concurrency at a time in a thread
+    pool. Claims are conditional UPDATEs rather than row locks, so any
+    number of workers can share the queue on any database, SQLite included.
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'[:100]
+        self._stopping = threading.Event()
+
+    def claim(self, limit):
+        """Mark up to limit due tasks as running for this worker, and return them"""
+        now = timezone.now()
+        candidates = Task.objects.filter(_claimable(now)).order_by('run_at', 'pk').values_list(
+            'pk', 'name', 'status', 'attempts', 'max_attempts',
+        )[:limit * CLAIM_LOOKAHEAD]
+        claimed = []
+        for pk, name, status, attempts, max_attempts in candidates:
+            if len(claimed) >= limit:
+                break
+            # Another worker may have claimed it since the read, so every update repeats the conditions
+            still_claimable = Task.objects.filter(_claimable(now), pk=pk)
+            func = get_task(name)
+            if func is None:
+                still_claimable.update(status='failed', last_error=f'No task is registered as "{name}".', finished_at=now)
+            elif status == 'running' and attempts >= max_attempts:
+                still_claimable.update(
+                    status='failed', locked_until=None,
+                    last_error=f'Timed out after {func.timeout} seconds on its last attempt.', finished_at=now,
+                )
+            elif still_claimable.update(
+                status='running', attempts=F('attempts') + 1, locked_by=self.name,
+                locked_until=now + timedelta(seconds=func.timeout),
+            ):
+                claimed.append(pk)
+        return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'pk')) if claimed else []
+
+    def execute(self, task):
+        func = get_task(task.name)
+        # Only the worker still holding this attempt may record its outcome
+        lease = Task.objects.filter(pk=task.pk, status='running', locked_by=self.name, attempts=task.attempts)
+        try:
+            if func.atomic:
+                with transaction.atomic():
+                    func(*task.args, **task.kwargs)
+                    if not self._finish(lease):
+                        raise LeaseLost
+            else:
+                func(*task.args, **task.kwargs)
+                self._finish(lease)
+        except LeaseLost:
+            logger.warning('Task %s (%s) timed out and was taken over; its writes were rolled back.', task.pk, task.name)
+        except Exception:
+            logger.exception('Task %s (%s) failed on attempt %s.', task.pk, task.name, task.attempts)
+            self._fail(task, func, lease, traceback.format_exc())
+
+    def _finish(self, lease):
+        return lease.update(status='done', locked_until=None, last_error='', finished_at=timezone.now())
+
+    def _fail(self, task, func, lease, error):
+        now = timezone.now()
+        if task.attempts < task.max_attempts:
+            lease.update(status='queued', locked_until=None, last_error=error, run_at=now + func.retry_delay(task.attempts))
+        else:
+            lease.update(status='failed', locked_until=None, last_error=error, finished_at=now)
+
+    def _execute_in_thread(self, task):
+        try:
+            self.execute(task)
+        finally:
+            close_old_connections()
+
+    def run_pending(self):
+        """Run due tasks one at a time in this thread until none are left; returns how many ran"""
+        count = 0
+        while tasks := self.claim(1):
+            self.execute(tasks[0])
+            count += 1
+        return count
+
+    def run(self, burst=False):
+        """Keep up to concurrency tasks running until stop() is called, or the queue is empty with burst"""
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='taskqueue') as pool:
+            while not self._stopping.is_set():
+                close_old_connections()
+                free = self.concurrency - len(running)
+                for task in self.claim(free) if free else []:
+                    running.add(pool.submit(self._execute_in_thread, task))
+                if running:
+                    done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif burst:
+                    break
+                else:
+                    self._stopping.wait(self.poll_interval)
+            # Leaving the with block waits for the tasks still running
+        close_old_connections()
+
+    def stop(self):
+        self._stopping.set()